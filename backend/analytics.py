@@ -0,0 +1,108 @@
+"""
+Analytics Aggregations for Postify AI
+Breakdowns of a user's generations are computed inside MongoDB with a single
+$facet pipeline, so only counts cross the wire and the numbers are correct for
+any history size (no more to_list(1000) truncation).
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Defaults for fields older documents may lack
+DEFAULT_PLATFORM = "instagram"
+DEFAULT_CONTENT_TYPE = "social_post"
+DEFAULT_TONE = "neutral"
+
+BREAKDOWN_FIELDS = {
+    "platform": DEFAULT_PLATFORM,
+    "content_type": DEFAULT_CONTENT_TYPE,
+    "tone": DEFAULT_TONE,
+}
+
+
+def _count_by(expression: Any) -> list:
+    return [{"$group": {"_id": expression, "count": {"$sum": 1}}}]
+
+
+def _as_dict(rows: list) -> Dict[Any, int]:
+    return {row["_id"]: row["count"] for row in rows}
+
+
+def _facet_count(facet: Dict[str, list], name: str) -> int:
+    """Value of a {"$count": "count"} facet, which is empty when nothing matched"""
+    rows = facet.get(name)
+    return rows[0]["count"] if rows else 0
+
+
+async def generation_breakdowns(
+    db,
+    user_email: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    include_daily: bool = False
+) -> Dict[str, Any]:
+    """
+    Count a user's generations in [start, end) in one round trip.
+    Returns {"total", "platform", "content_type", "tone"} and, when asked,
+    "daily": {"YYYY-MM-DD": count} keyed by UTC day.
+    """
+    window = {"$gte": start}
+    if end is not None:
+        window["$lt"] = end
+
+    facets = {
+        "total": [{"$count": "count"}],
+        **{
+            field: _count_by({"$ifNull": [f"${field}", default]})
+            for field, default in BREAKDOWN_FIELDS.items()
+        }
+    }
+    if include_daily:
+        facets["daily"] = _count_by({"$dateTrunc": {"date": "$created_at", "unit": "day", "timezone": "UTC"}})
+
+    rows = await db.generations.aggregate([
+        {"$match": {"user_email": user_email, "created_at": window}},
+        {"$project": {"_id": 0, "created_at": 1, **{field: 1 for field in BREAKDOWN_FIELDS}}},
+        {"$facet": facets}
+    ]).to_list(1)
+    facet = rows[0] if rows else {}
+
+    result = {
+        "total": _facet_count(facet, "total"),
+        **{field: _as_dict(facet.get(field, [])) for field in BREAKDOWN_FIELDS}
+    }
+    if include_daily:
+        result["daily"] = {
+            day.astimezone(timezone.utc).strftime("%Y-%m-%d"): count
+            for day, count in _as_dict(facet.get("daily", [])).items()
+        }
+    return result
+
+
+async def generation_summary(db, user_email: str, recent_since: datetime, top_types: int = 5) -> Dict[str, Any]:
+    """All-time total, top content types and the count since `recent_since`, in one round trip"""
+    rows = await db.generations.aggregate([
+        {"$match": {"user_email": user_email}},
+        {"$project": {"_id": 0, "content_type": 1, "created_at": 1}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "content_types": [
+                *_count_by("$content_type"),
+                {"$sort": {"count": -1}},
+                {"$limit": top_types}
+            ],
+            "recent": [
+                {"$match": {"created_at": {"$gte": recent_since}}},
+                {"$count": "count"}
+            ]
+        }}
+    ]).to_list(1)
+    facet = rows[0] if rows else {}
+    return {
+        "total": _facet_count(facet, "total"),
+        "content_types": facet.get("content_types", []),
+        "recent": _facet_count(facet, "recent")
+    }
@@ -0,0 +1,129 @@
+"""
+Analytics Response Cache for Postify AI
+Analytics responses only change when the user writes something they are built
+from. Each user has a monotonically increasing content_version (collection
+`content_versions`), bumped with the daily rollups on every generation, image
+or favorite write, and on campaign creation and deletion. Responses are cached under
+(user, endpoint, params, version, UTC day), so a write makes old entries
+unreachable instead of having to find and delete them; the day keeps
+"last N days" windows moving at midnight.
+
+Concurrent misses for the same key share one recompute (single-flight).
+
+Backends (ANALYTICS_CACHE_BACKEND):
+    memory  - per-process LRU bounded by ANALYTICS_CACHE_MAX_ENTRIES (default)
+    mongo   - shared `analytics_cache` collection, expired by a TTL index
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from auth_cache import TTLCache
+from idempotency import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANALYTICS_CACHE_BACKEND = os.environ.get('ANALYTICS_CACHE_BACKEND', 'memory').lower()  # memory | mongo
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', '5000'))
+ANALYTICS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', '3600'))  # Upper bound; versions do the real work
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES, ttl: float = ANALYTICS_CACHE_TTL_SECONDS):
+        self._cache = TTLCache(max_entries, ttl)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._cache.set(key, value)
+
+
+class MongoBackend:
+    """Shared across nodes: {_id: key, value, expires_at}"""
+
+    def __init__(self, db, ttl: int = ANALYTICS_CACHE_TTL_SECONDS):
+        self.db = db
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        doc = await self.db.analytics_cache.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"_id": 0, "value": 1}
+        )
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        await self.db.analytics_cache.replace_one(
+            {"_id": key},
+            {"value": value, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)},
+            upsert=True
+        )
+
+
+backend = MemoryBackend()
+
+
+def configure(db):
+    """Build the process-wide backend from ANALYTICS_CACHE_BACKEND"""
+    global backend
+    if ANALYTICS_CACHE_BACKEND == "mongo":
+        backend = MongoBackend(db)
+    else:
+        if ANALYTICS_CACHE_BACKEND != "memory":
+            logger.warning(f"Unknown ANALYTICS_CACHE_BACKEND '{ANALYTICS_CACHE_BACKEND}', using memory")
+        backend = MemoryBackend()
+    logger.info(f"Analytics cache backend: {type(backend).__name__}")
+    return backend
+
+
+# ============= CONTENT VERSIONS =============
+
+async def bump_version(db, user_email: str) -> None:
+    """Mark a user's analytics inputs as changed"""
+    await db.content_versions.update_one(
+        {"user_email": user_email},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+async def get_version(db, user_email: str) -> int:
+    doc = await db.content_versions.find_one({"user_email": user_email}, {"_id": 0, "version": 1})
+    return doc["version"] if doc else 0
+
+
+# ============= CACHE =============
+
+def cache_key(user_email: str, endpoint: str, params: Dict[str, Any], version: int) -> str:
+    day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    material = json.dumps([user_email, endpoint, params, version, day], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def get_or_compute(
+    db,
+    user_email: str,
+    endpoint: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Cached response for the user's current content version, computing it at most once per key"""
+    key = cache_key(user_email, endpoint, params, await get_version(db, user_email))
+    cached = await backend.get(key)
+    if cached is not None:
+        return cached
+
+    async def compute_and_store() -> Dict[str, Any]:
+        value = await compute()
+        try:
+            await backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"Analytics cache store failed for {endpoint}: {e}")
+        return value
+
+    return await single_flight(f"analytics:{key}", compute_and_store)
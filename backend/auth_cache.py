@@ -0,0 +1,191 @@
+"""
+Authenticated-User Cache for Postify AI
+In-process TTL/LRU cache of decoded JWTs, user documents and cookie sessions,
+so authentication does not cost a Mongo round trip per request.
+
+Any write that changes a user must call invalidate_user(). With
+AUTH_CACHE_SYNC enabled, invalidations are also published through the
+auth_invalidations collection and applied by every other node.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any
+
+from timestamps import to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', '30'))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000'))
+AUTH_CACHE_SYNC = os.environ.get('AUTH_CACHE_SYNC', 'false').lower() == 'true'
+AUTH_CACHE_SYNC_SECONDS = float(os.environ.get('AUTH_CACHE_SYNC_SECONDS', '2'))
+AUTH_CACHE_SYNC_SKEW_SECONDS = 5  # Re-read this far back to tolerate clock skew between nodes
+
+NODE_ID = uuid.uuid4().hex
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after a TTL"""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl: float = AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def items(self):
+        return list(self._data.items())
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# token -> email, user email -> user doc, session token -> session doc
+_tokens = TTLCache()
+_users = TTLCache()
+_sessions = TTLCache()
+
+
+def enabled() -> bool:
+    return AUTH_CACHE_TTL_SECONDS > 0
+
+
+def get_token_email(token: str) -> Optional[str]:
+    """Email of an already-verified, unexpired JWT"""
+    return _tokens.get(token) if enabled() else None
+
+
+def set_token_email(token: str, email: str, exp: Optional[float]) -> None:
+    """Remember a verified JWT until it expires (or the cache TTL, whichever is first)"""
+    if enabled():
+        ttl = exp - time.time() if exp else AUTH_CACHE_TTL_SECONDS
+        _tokens.set(token, email, ttl)
+
+
+async def get_user(db, email: str) -> Optional[Dict[str, Any]]:
+    """User document by email, from cache or Mongo. Returns a copy callers may modify."""
+    user = _users.get(email) if enabled() else None
+    if user is None:
+        user = await db.users.find_one({"email": email}, {"_id": 0})
+        if user is None:
+            return None
+        if enabled():
+            _users.set(email, user)
+    return dict(user)
+
+
+async def get_session_user(db, session_token: str) -> Optional[Dict[str, Any]]:
+    """User behind an unexpired cookie session, from cache or Mongo"""
+    session = _sessions.get(session_token) if enabled() else None
+    if session is None:
+        session = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
+        if session is None:
+            return None
+        user = await db.users.find_one({"user_id": session["user_id"]}, {"_id": 0})
+        if user is None:
+            return None
+        # Remember which email the session resolves to, user docs are cached by email
+        session = {**session, "email": user["email"]}
+        if enabled():
+            _sessions.set(session_token, session)
+            _users.set(user["email"], user)
+
+    if to_datetime(session.get("expires_at")) <= datetime.now(timezone.utc):
+        return None
+    return await get_user(db, session["email"])
+
+
+def _evict(email: Optional[str] = None, user_id: Optional[str] = None, session_token: Optional[str] = None) -> None:
+    if email:
+        _users.pop(email)
+    if session_token:
+        _sessions.pop(session_token)
+    if user_id:
+        for token, (_, session) in _sessions.items():
+            if session.get("user_id") == user_id:
+                _sessions.pop(token)
+
+
+async def invalidate_user(
+    db,
+    email: Optional[str] = None,
+    user_id: Optional[str] = None,
+    session_token: Optional[str] = None
+) -> None:
+    """Drop a user (and optionally their sessions) from this node's cache and notify other nodes"""
+    _evict(email, user_id, session_token)
+    if AUTH_CACHE_SYNC:
+        try:
+            await db.auth_invalidations.insert_one({
+                "email": email,
+                "user_id": user_id,
+                "session_token": session_token,
+                "node": NODE_ID,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            logger.error(f"Auth cache: failed to publish invalidation for {email}: {e}")
+
+
+async def run_invalidation_listener(db, stop_event: asyncio.Event) -> None:
+    """Poll invalidations published by other nodes and apply them locally"""
+    since = datetime.now(timezone.utc)
+    logger.info(f"Auth cache sync listener started (node {NODE_ID}, every {AUTH_CACHE_SYNC_SECONDS}s)")
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=AUTH_CACHE_SYNC_SECONDS)
+            break
+        except asyncio.TimeoutError:
+            pass
+        polled_at = datetime.now(timezone.utc)
+        try:
+            events = await db.auth_invalidations.find(
+                {"created_at": {"$gte": since - timedelta(seconds=AUTH_CACHE_SYNC_SKEW_SECONDS)}, "node": {"$ne": NODE_ID}},
+                {"_id": 0, "email": 1, "user_id": 1, "session_token": 1}
+            ).to_list(None)
+            for event in events:
+                _evict(event.get("email"), event.get("user_id"), event.get("session_token"))
+            since = polled_at
+        except Exception as e:
+            logger.error(f"Auth cache sync error: {e}")
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        name: {"entries": len(cache), "hits": cache.hits, "misses": cache.misses}
+        for name, cache in (("tokens", _tokens), ("users", _users), ("sessions", _sessions))
+    }
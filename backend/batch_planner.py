@@ -0,0 +1,62 @@
+"""
+Marketing Batch Planner for Postify AI
+Several platforms share an image size and aspect ratio (Instagram/Email,
+YouTube/Telegram). Their enhanced prompts differ only by the platform hint,
+so one render serves the whole group. The planner collapses a batch into its
+unique renders, runs them concurrently under a limit, and yields each one as
+soon as it finishes so results can fan back out per platform.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Callable, Awaitable, AsyncIterator, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BATCH_RENDER_CONCURRENCY = int(os.environ.get('BATCH_RENDER_CONCURRENCY', '3'))
+
+
+def plan_renders(platforms: List[str], specs: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group platforms that render identically (same size and aspect ratio).
+    Returns one render per group, in first-seen platform order.
+    """
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for platform in platforms:
+        spec = specs[platform]
+        groups.setdefault((spec["size"], spec["aspect"]), []).append(platform)
+    return [
+        {"size": size, "aspect": aspect, "platforms": group}
+        for (size, aspect), group in groups.items()
+    ]
+
+
+async def run_renders(
+    renders: List[Dict[str, Any]],
+    func: Callable[[Dict[str, Any]], Awaitable[Any]],
+    limit: int = BATCH_RENDER_CONCURRENCY
+) -> AsyncIterator[Tuple[Dict[str, Any], Any, Optional[Exception]]]:
+    """
+    Run func(render) for every render, at most `limit` at a time.
+    Yields (render, result, error) in completion order; a failed render
+    does not stop the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(render):
+        async with semaphore:
+            try:
+                return render, await func(render), None
+            except Exception as e:
+                return render, None, e
+
+    tasks = [asyncio.create_task(_run(render)) for render in renders]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer stopped early (or was cancelled): do not leave renders running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,107 @@
+"""
+Login Throughput Benchmark for Postify AI
+Drives concurrent logins against a running server and measures the latency
+of an unrelated endpoint while they are in flight. If password hashing
+blocks the event loop, probe latency climbs with login concurrency.
+
+Usage:
+    python bench_login.py --url http://localhost:8001 --concurrency 20 --logins 200
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from typing import List, Dict, Any
+
+import httpx
+
+PASSWORD = "BenchPass123!"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> str:
+    return f"n={len(samples)} p50={percentile(samples, 50) * 1000:.1f}ms p99={percentile(samples, 99) * 1000:.1f}ms"
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, samples: List[float]) -> None:
+    """Hit a cheap endpoint in a loop, recording latency"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def login_worker(client: httpx.AsyncClient, email: str, queue: asyncio.Queue, results: Dict[str, Any]) -> None:
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        results["latencies"].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            results["errors"] += 1
+
+
+async def measure_probe(client: httpx.AsyncClient, path: str, seconds: float) -> List[float]:
+    samples: List[float] = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(client, path, stop, samples))
+    await asyncio.sleep(seconds)
+    stop.set()
+    await task
+    return samples
+
+
+async def main(args) -> int:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        email = f"bench_login_{uuid.uuid4().hex[:8]}@test.com"
+        response = await client.post("/api/auth/register", json={
+            "email": email, "password": PASSWORD, "full_name": "Login Bench"
+        })
+        if response.status_code != 201:
+            print(f"Register failed: {response.status_code} {response.text}")
+            return 1
+
+        baseline = await measure_probe(client, args.probe_path, args.baseline_seconds)
+        print(f"probe {args.probe_path} idle:        {summarize(baseline)}")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(args.logins):
+            queue.put_nowait(None)
+        results: Dict[str, Any] = {"latencies": [], "errors": 0}
+        under_load: List[float] = []
+        stop = asyncio.Event()
+
+        started = time.perf_counter()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, stop, under_load))
+        await asyncio.gather(*(login_worker(client, email, queue, results) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+
+        print(f"probe {args.probe_path} during logins: {summarize(under_load)}")
+        print(f"logins: {summarize(results['latencies'])} errors={results['errors']} "
+              f"throughput={len(results['latencies']) / elapsed:.1f}/s (concurrency {args.concurrency})")
+        return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent logins against a running server")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probe-path", default="/api/templates")
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
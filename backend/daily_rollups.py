@@ -0,0 +1,326 @@
+"""
+Daily Rollups for Postify AI
+Per-user, per-day analytics counters: one small document per (user_email, day)
+with nested counts by platform, content_type and tone, plus images, favorites
+and campaign posts. Every write path bumps the day's document with a single
+upsert $inc, so analytics reads touch at most one document per day in range
+instead of scanning raw generations. Each write also bumps the user's
+analytics content_version, which retires their cached analytics responses.
+
+Rollups mirror generations, image_generations and favorites and can be rebuilt
+from them at any time. Until the first backfill has finished, analytics reads
+fall back to aggregating the raw collections.
+
+Usage:
+    python daily_rollups.py backfill [--user EMAIL] [--restart]
+    python daily_rollups.py status
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Iterable
+
+from pymongo import UpdateOne
+
+import analytics
+import analytics_cache
+from analytics import BREAKDOWN_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Counter fields
+GENERATIONS = "generations"
+IMAGES = "images"
+FAVORITES = "favorites"
+CAMPAIGN_POSTS = "campaign_posts"
+COUNTER_FIELDS = [GENERATIONS, IMAGES, FAVORITES, CAMPAIGN_POSTS]
+
+MIGRATION_ID = "daily_rollups"
+BACKFILL_BATCH_SIZE = 100
+
+_ready = False
+
+
+def day_start(when: Optional[datetime] = None) -> datetime:
+    """UTC midnight of the day containing `when` (default: now)"""
+    when = (when or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _field_key(value: Any) -> str:
+    """Values become nested field names, so '.', a leading '$' and '' are not allowed"""
+    key = str(value).replace(".", "_")
+    if key.startswith("$"):
+        key = "_" + key[1:]
+    return key or "unknown"
+
+
+def generation_increments(doc: Dict[str, Any]) -> Dict[str, int]:
+    """$inc paths a single generation document contributes to its day"""
+    increments = {GENERATIONS: 1}
+    for field, default in BREAKDOWN_FIELDS.items():
+        value = doc.get(field)
+        increments[f"{field}.{_field_key(default if value is None else value)}"] = 1
+    if doc.get("content_type") == "campaign_post":
+        increments[CAMPAIGN_POSTS] = 1
+    return increments
+
+
+def _increment(increments: Dict[str, int]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    return {"$inc": increments, "$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}}
+
+
+async def record_generations(db, generations: Iterable[Dict[str, Any]]) -> None:
+    """Count freshly inserted generation documents; one upsert per (user, day)"""
+    grouped: Dict[tuple, Dict[str, int]] = {}
+    for doc in generations:
+        increments = grouped.setdefault((doc["user_email"], day_start(doc.get("created_at"))), {})
+        for path, n in generation_increments(doc).items():
+            increments[path] = increments.get(path, 0) + n
+    if grouped:
+        await db.daily_rollups.bulk_write(
+            [
+                UpdateOne({"user_email": email, "day": day}, _increment(increments), upsert=True)
+                for (email, day), increments in grouped.items()
+            ],
+            ordered=False
+        )
+        for email in {email for email, _ in grouped}:
+            await analytics_cache.bump_version(db, email)
+
+
+async def record(db, user_email: str, when: Optional[datetime] = None, **increments: int) -> None:
+    """Add to a day's flat counters, e.g. record(db, email, images=1) or favorites=-1"""
+    increments = {field: n for field, n in increments.items() if n}
+    if not increments:
+        return
+    await db.daily_rollups.update_one(
+        {"user_email": user_email, "day": day_start(when)}, _increment(increments), upsert=True
+    )
+    await analytics_cache.bump_version(db, user_email)
+
+
+# ============= READS =============
+
+async def is_ready(db) -> bool:
+    """True once a full backfill has finished; cached for the life of the process"""
+    global _ready
+    if not _ready:
+        _ready = await db.migrations.count_documents(
+            {"_id": f"{MIGRATION_ID}:all", "finished_at": {"$exists": True}}, limit=1
+        ) > 0
+    return _ready
+
+
+def _merge(total: Dict[str, int], counts: Dict[str, int]) -> None:
+    for key, n in counts.items():
+        total[key] = total.get(key, 0) + n
+
+
+async def summarize(db, user_email: str, start: datetime, end: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Sum a user's rollups for the UTC days from start's day up to (not including)
+    end's day. Same shape as analytics.generation_breakdowns with the daily
+    series, plus images, favorites and campaign_posts.
+    """
+    window = {"$gte": day_start(start)}
+    if end is not None:
+        window["$lt"] = day_start(end)
+    docs = await db.daily_rollups.find(
+        {"user_email": user_email, "day": window}, {"_id": 0, "user_email": 0}
+    ).to_list(None)
+
+    result: Dict[str, Any] = {
+        "total": 0,
+        **{field: {} for field in BREAKDOWN_FIELDS},
+        "daily": {},
+        IMAGES: 0,
+        FAVORITES: 0,
+        CAMPAIGN_POSTS: 0
+    }
+    for doc in docs:
+        generations = doc.get(GENERATIONS, 0)
+        result["total"] += generations
+        for field in BREAKDOWN_FIELDS:
+            _merge(result[field], doc.get(field, {}))
+        if generations:
+            result["daily"][day_start(doc["day"]).strftime("%Y-%m-%d")] = generations
+        for field in (IMAGES, FAVORITES, CAMPAIGN_POSTS):
+            result[field] += doc.get(field, 0)
+    for field in BREAKDOWN_FIELDS:
+        result[field] = {key: n for key, n in result[field].items() if n}
+    return result
+
+
+async def breakdowns(
+    db,
+    user_email: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    include_daily: bool = False
+) -> Dict[str, Any]:
+    """
+    Generation counts by platform, type, tone (and day) plus image count for a period.
+    Served from rollups once they are backfilled, else aggregated from raw history.
+    """
+    if await is_ready(db):
+        return await summarize(db, user_email, start, end)
+
+    image_window = {"$gte": start, **({"$lt": end} if end else {})}
+    counts, images = await asyncio.gather(
+        analytics.generation_breakdowns(db, user_email, start, end, include_daily),
+        db.image_generations.count_documents({"user_email": user_email, "created_at": image_window})
+    )
+    return {**counts, IMAGES: images}
+
+
+# ============= BACKFILL =============
+
+def _day(field: str) -> Dict[str, Any]:
+    return {"$dateTrunc": {"date": f"${field}", "unit": "day", "timezone": "UTC"}}
+
+
+async def _rebuild_user(db, user_email: str) -> int:
+    """Replace one user's rollups with counts rebuilt from the raw collections"""
+    generation_rows, image_rows, favorite_rows = await asyncio.gather(
+        db.generations.aggregate([
+            {"$match": {"user_email": user_email, "created_at": {"$type": "date"}}},
+            {"$group": {
+                "_id": {
+                    "day": _day("created_at"),
+                    **{field: {"$ifNull": [f"${field}", default]} for field, default in BREAKDOWN_FIELDS.items()}
+                },
+                "count": {"$sum": 1}
+            }}
+        ]).to_list(None),
+        db.image_generations.aggregate([
+            {"$match": {"user_email": user_email, "created_at": {"$type": "date"}}},
+            {"$group": {"_id": _day("created_at"), "count": {"$sum": 1}}}
+        ]).to_list(None),
+        db.favorites.aggregate([
+            {"$match": {"user_email": user_email, "favorited_at": {"$type": "date"}}},
+            {"$group": {"_id": _day("favorited_at"), "count": {"$sum": 1}}}
+        ]).to_list(None)
+    )
+
+    days: Dict[datetime, Dict[str, Any]] = {}
+
+    def counters(when: datetime) -> Dict[str, Any]:
+        return days.setdefault(day_start(when), {
+            **{field: 0 for field in COUNTER_FIELDS},
+            **{field: {} for field in BREAKDOWN_FIELDS}
+        })
+
+    for row in generation_rows:
+        doc = counters(row["_id"]["day"])
+        doc[GENERATIONS] += row["count"]
+        for field in BREAKDOWN_FIELDS:
+            key = _field_key(row["_id"][field])
+            doc[field][key] = doc[field].get(key, 0) + row["count"]
+        if row["_id"]["content_type"] == "campaign_post":
+            doc[CAMPAIGN_POSTS] += row["count"]
+    for row in image_rows:
+        counters(row["_id"])[IMAGES] += row["count"]
+    for row in favorite_rows:
+        counters(row["_id"])[FAVORITES] += row["count"]
+
+    now = datetime.now(timezone.utc)
+    ops: List[Any] = [
+        UpdateOne(
+            {"user_email": user_email, "day": when},
+            {"$set": {**doc, "rebuilt_at": now, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True
+        )
+        for when, doc in days.items()
+    ]
+    if ops:
+        await db.daily_rollups.bulk_write(ops, ordered=False)
+    # Days with rollups but no raw history left
+    await db.daily_rollups.delete_many({"user_email": user_email, "day": {"$nin": list(days)}})
+    return len(days)
+
+
+async def backfill(db, user_email: Optional[str] = None, restart: bool = False) -> Dict[str, Any]:
+    """
+    Rebuild rollups from history for one user, or for every user in _id order
+    with a checkpoint in `migrations`. Writes that land while a user is being
+    rebuilt may be overwritten; run again (or per user) to correct them.
+    """
+    if user_email:
+        days = await _rebuild_user(db, user_email)
+        return {"users": 1, "days": days}
+
+    checkpoint_id = f"{MIGRATION_ID}:all"
+    if restart:
+        await db.migrations.update_one({"_id": checkpoint_id}, {"$unset": {"last_id": "", "users": "", "days": ""}})
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    users = checkpoint.get("users", 0)
+    days = checkpoint.get("days", 0)
+
+    while True:
+        query: Dict[str, Any] = {}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.users.find(query, {"email": 1}).sort("_id", 1).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+        if not batch:
+            break
+
+        for user in batch:
+            if user.get("email"):
+                days += await _rebuild_user(db, user["email"])
+                users += 1
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "users": users, "days": days, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"users": users, "days": days, "finished_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"Daily rollups backfilled: {users} users, {days} days")
+    return {"users": users, "days": days}
+
+
+async def run_backfill_job(db, job: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """Job handler: backfill rollups for payload["user_email"], or everyone"""
+    return await backfill(db, job["payload"].get("user_email"), job["payload"].get("restart", False))
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if args.command == "backfill":
+            result = await backfill(db, args.user, args.restart)
+            print(f"{result['users']} users, {result['days']} days rebuilt")
+        checkpoint = await db.migrations.find_one({"_id": f"{MIGRATION_ID}:all"}) or {}
+        state = "finished" if checkpoint.get("finished_at") else "not finished"
+        print(f"Full backfill {state}; {await db.daily_rollups.estimated_document_count()} rollup documents")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild per-user daily analytics rollups from raw collections")
+    parser.add_argument("command", choices=["backfill", "status"])
+    parser.add_argument("--user", default=None, help="Only rebuild this user's rollups")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rebuild every user")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
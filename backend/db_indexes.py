@@ -0,0 +1,296 @@
+"""
+MongoDB Index Registry for Postify AI
+Declarative index definitions applied at startup, plus an audit command that
+explains the app's real query shapes and reports collection scans.
+
+Usage:
+    python db_indexes.py ensure     # create missing indexes
+    python db_indexes.py audit      # explain() the query catalogue, exit 1 on COLLSCAN
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, Any, List
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+# Only index fields holding a string - documents without the field are not
+# indexed, so a unique constraint does not collide on missing values
+HAS_STRING = {"$type": "string"}
+
+# ============= INDEX REGISTRY =============
+# collection -> [{"keys": [...], **create_index options}]
+
+INDEXES: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+        {"keys": [("user_id", ASCENDING)], "unique": True, "partialFilterExpression": {"user_id": HAS_STRING}},
+        {"keys": [("referral_code", ASCENDING)], "unique": True, "partialFilterExpression": {"referral_code": HAS_STRING}},
+        {"keys": [("subscription_plan", ASCENDING), ("_id", ASCENDING)]},
+    ],
+    "user_sessions": [
+        {"keys": [("session_token", ASCENDING)], "unique": True},
+        {"keys": [("user_id", ASCENDING)], "unique": True},
+    ],
+    "subscriptions": [
+        {"keys": [("user_email", ASCENDING)], "unique": True},
+    ],
+    "user_preferences": [
+        {"keys": [("user_email", ASCENDING)], "unique": True},
+    ],
+    "brand_profiles": [
+        {"keys": [("user_email", ASCENDING)], "unique": True},
+    ],
+    "drafts": [
+        {"keys": [("user_email", ASCENDING), ("draft_type", ASCENDING)], "unique": True},
+    ],
+    "generations": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "image_generations": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("user_email", ASCENDING), ("platform", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "image_batches": [
+        {"keys": [("batch_id", ASCENDING)], "unique": True},
+    ],
+    "image_analytics": [
+        {"keys": [("user_email", ASCENDING), ("action", ASCENDING)]},
+    ],
+    "favorites": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("generation_id", ASCENDING)]},
+        {"keys": [("user_email", ASCENDING), ("order", ASCENDING), ("favorited_at", DESCENDING)]},
+        {"keys": [("user_email", ASCENDING), ("folder_id", ASCENDING)]},
+    ],
+    "favorite_folders": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("order", ASCENDING)]},
+    ],
+    "user_templates": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "campaigns": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("share_token", ASCENDING)], "unique": True, "partialFilterExpression": {"share_token": HAS_STRING}},
+    ],
+    "scheduled_posts": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("user_email", ASCENDING), ("scheduled_time", ASCENDING)]},
+        {"keys": [("user_email", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "share_events": [
+        {"keys": [("user_email", ASCENDING), ("event_type", ASCENDING)]},
+        {"keys": [("campaign_id", ASCENDING), ("timestamp", ASCENDING)]},
+    ],
+    "analytics_events": [
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "referrals": [
+        {"keys": [("referrer_email", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "pricing_events": [
+        {"keys": [("user_email", ASCENDING), ("event_type", ASCENDING), ("timestamp", DESCENDING)]},
+    ],
+    "email_logs": [
+        {"keys": [("user_email", ASCENDING), ("sent_at", DESCENDING)]},
+    ],
+    "drip_sequences": [
+        {"keys": [("user_email", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("user_email", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("status", ASCENDING), ("cancel_reason", ASCENDING), ("current_step", ASCENDING)]},
+    ],
+    "drip_queue": [
+        {"keys": [("status", ASCENDING), ("check_at", ASCENDING)]},
+    ],
+    "usage_counters": [
+        {"keys": [("user_email", ASCENDING), ("month", ASCENDING)], "unique": True},
+        {"keys": [("month", ASCENDING)]},
+    ],
+    "daily_rollups": [
+        {"keys": [("user_email", ASCENDING), ("day", ASCENDING)], "unique": True},
+    ],
+    "weekly_reports": [
+        {"keys": [("user_email", ASCENDING), ("week", ASCENDING)], "unique": True},
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "content_versions": [
+        {"keys": [("user_email", ASCENDING)], "unique": True},
+    ],
+    "analytics_cache": [
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "jobs": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("status", ASCENDING), ("run_at", ASCENDING)]},
+        {"keys": [("status", ASCENDING), ("lease_expires_at", ASCENDING)]},
+    ],
+    "rate_limits": [
+        # expires_at is when a key's budget is fully restored; idle keys are dropped then
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "generation_cache": [
+        # expires_at slides forward on every store and hit
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "idempotency_keys": [
+        {"keys": [("user_email", ASCENDING), ("key", ASCENDING)], "unique": True},
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "auth_invalidations": [
+        # Listeners only look back a few seconds; expire the feed after an hour
+        {"keys": [("created_at", ASCENDING)], "expireAfterSeconds": 3600},
+    ],
+}
+
+
+def index_name(keys: List[tuple]) -> str:
+    """Same naming as pymongo's default: field_direction joined by underscores"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """
+    Create every registry index. Idempotent; an index that fails to build
+    (e.g. duplicate values under a new unique constraint) is logged and skipped.
+    """
+    created, failed = 0, []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            name = index_name(spec["keys"])
+            try:
+                await db[collection].create_index(spec["keys"], name=name, **options)
+                created += 1
+            except Exception as e:
+                logger.error(f"Index {collection}.{name} failed: {e}")
+                failed.append({"collection": collection, "index": name, "error": str(e)[:200]})
+
+    logger.info(f"Indexes ensured: {created} ok, {len(failed)} failed")
+    return {"ensured": created, "failed": failed}
+
+
+# ============= QUERY AUDIT =============
+# Representative shapes of the app's hot queries: (collection, label, filter, sort)
+
+AUDIT_EMAIL = "audit@example.com"
+AUDIT_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+QUERY_CATALOGUE: List[tuple] = [
+    ("users", "login / get_current_user", {"email": AUDIT_EMAIL}, None),
+    ("users", "google oauth session user", {"user_id": "user_audit"}, None),
+    ("users", "referral code lookup", {"referral_code": "AUDIT123"}, None),
+    ("user_sessions", "session cookie auth", {"session_token": "audit"}, None),
+    ("subscriptions", "usage limit check", {"user_email": AUDIT_EMAIL}, None),
+    ("brand_profiles", "brand profile", {"user_email": AUDIT_EMAIL}, None),
+    ("drafts", "autosave draft", {"user_email": AUDIT_EMAIL, "draft_type": "content"}, None),
+    ("generations", "monthly usage count", {"user_email": AUDIT_EMAIL, "created_at": {"$gte": AUDIT_DATE}}, None),
+    ("generations", "history page", {"user_email": AUDIT_EMAIL}, [("created_at", -1)]),
+    ("generations", "generation by id", {"id": "audit", "user_email": AUDIT_EMAIL}, None),
+    ("image_generations", "monthly image usage", {"user_email": AUDIT_EMAIL, "created_at": {"$gte": AUDIT_DATE}}, None),
+    ("image_generations", "image history", {"user_email": AUDIT_EMAIL}, [("created_at", -1)]),
+    ("image_generations", "content library by platform", {"user_email": AUDIT_EMAIL, "platform": "instagram"}, [("created_at", -1)]),
+    ("image_generations", "image download", {"id": "audit", "user_email": AUDIT_EMAIL}, None),
+    ("image_analytics", "image analytics", {"user_email": AUDIT_EMAIL}, None),
+    ("favorites", "favorites list", {"user_email": AUDIT_EMAIL}, [("order", 1), ("favorited_at", -1)]),
+    ("favorites", "favorite check", {"generation_id": "audit", "user_email": AUDIT_EMAIL}, None),
+    ("favorites", "folder count", {"user_email": AUDIT_EMAIL, "folder_id": "audit"}, None),
+    ("favorite_folders", "folders", {"user_email": AUDIT_EMAIL}, [("order", 1)]),
+    ("user_templates", "templates", {"user_email": AUDIT_EMAIL}, [("created_at", -1)]),
+    ("campaigns", "campaign list", {"user_email": AUDIT_EMAIL}, [("created_at", -1)]),
+    ("campaigns", "campaign by id", {"id": "audit", "user_email": AUDIT_EMAIL}, None),
+    ("campaigns", "public shared campaign", {"share_token": "audit"}, None),
+    ("scheduled_posts", "scheduler calendar", {"user_email": AUDIT_EMAIL, "scheduled_time": {"$gte": AUDIT_DATE}}, [("scheduled_time", 1)]),
+    ("scheduled_posts", "scheduler stats", {"user_email": AUDIT_EMAIL, "status": "scheduled"}, None),
+    ("share_events", "first share bonus", {"user_email": AUDIT_EMAIL, "event_type": "first_post_share"}, None),
+    ("share_events", "campaign share stats", {"campaign_id": "audit", "timestamp": {"$gte": AUDIT_DATE}}, None),
+    ("referrals", "referral list", {"referrer_email": AUDIT_EMAIL}, [("created_at", -1)]),
+    ("pricing_events", "pricing viewed", {"user_email": AUDIT_EMAIL, "event_type": "pricing_viewed"}, [("timestamp", -1)]),
+    ("email_logs", "recent emails", {"user_email": AUDIT_EMAIL}, [("sent_at", -1)]),
+    ("drip_sequences", "active drip", {"user_email": AUDIT_EMAIL, "status": "active"}, None),
+    ("drip_sequences", "drip conversions", {"status": "cancelled", "cancel_reason": "converted"}, None),
+    ("drip_queue", "pending drip checks", {"status": "pending", "check_at": {"$lte": AUDIT_DATE}}, None),
+    ("usage_counters", "quota point lookup", {"user_email": AUDIT_EMAIL, "month": "2025-01"}, None),
+    ("daily_rollups", "analytics day range", {"user_email": AUDIT_EMAIL, "day": {"$gte": AUDIT_DATE}}, None),
+    ("weekly_reports", "stored weekly report", {"user_email": AUDIT_EMAIL, "week": "2025-W01", "day": AUDIT_DATE}, None),
+    ("users", "weekly report walk", {"subscription_plan": {"$in": ["pro", "business"]}, "_id": {"$gt": "audit"}}, [("_id", 1)]),
+    ("content_versions", "analytics cache version", {"user_email": AUDIT_EMAIL}, None),
+    ("jobs", "job status", {"id": "audit"}, None),
+    ("auth_invalidations", "auth cache sync poll", {"created_at": {"$gte": AUDIT_DATE}, "node": {"$ne": "audit"}}, None),
+    ("jobs", "lease next job", {"status": "queued", "run_at": {"$lte": AUDIT_DATE}}, [("run_at", 1)]),
+]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of a winning plan tree"""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def audit_queries(db) -> List[Dict[str, Any]]:
+    """Explain every catalogue query and report the winning plan"""
+    report = []
+    for collection, label, query, sort in QUERY_CATALOGUE:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "collection": collection,
+            "query": label,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages
+        })
+    return report
+
+
+async def _main(command: str) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if command == "ensure":
+            result = await ensure_indexes(db)
+            for failure in result["failed"]:
+                print(f"FAILED  {failure['collection']}.{failure['index']}: {failure['error']}")
+            print(f"{result['ensured']} indexes ensured, {len(result['failed'])} failed")
+            return 1 if result["failed"] else 0
+
+        report = await audit_queries(db)
+        for row in report:
+            status = "COLLSCAN" if row["collscan"] else ("SORT" if row["in_memory_sort"] else "ok")
+            print(f"{status:<9} {row['collection']:<18} {row['query']:<32} {' <- '.join(row['stages'])}")
+        scans = sum(1 for row in report if row["collscan"])
+        print(f"\n{len(report)} queries audited, {scans} collection scans")
+        return 1 if scans else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2 or sys.argv[1] not in ("ensure", "audit"):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
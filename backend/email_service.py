@@ -10,6 +10,8 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, EmailStr
 
+from timestamps import to_datetime, parse_optional
+
 # Try to import resend, handle if not available
 try:
     import resend
@@ -394,12 +396,12 @@ async def process_drip_campaign(db, user_email: str, user_data: Dict[str, Any])
         # Campaign completed
         await db.drip_sequences.update_one(
             {"user_email": user_email, "status": "active"},
-            {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}}
+            {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc)}}
         )
         return
     
     email_config = DRIP_CONFIG["emails"][current_step]
-    scheduled_at = datetime.fromisoformat(drip_sequence.get("next_email_at"))
+    scheduled_at = to_datetime(drip_sequence.get("next_email_at"))
     
     if datetime.now(timezone.utc) >= scheduled_at:
         # Time to send email
@@ -415,7 +417,7 @@ async def process_drip_campaign(db, user_email: str, user_data: Dict[str, Any])
             "drip_sequence_id": drip_sequence.get("sequence_id"),
             "status": result["status"],
             "email_id": result.get("email_id"),
-            "sent_at": datetime.now(timezone.utc).isoformat(),
+            "sent_at": datetime.now(timezone.utc),
             "mode": result.get("mode", "unknown")
         })
         
@@ -428,8 +430,8 @@ async def process_drip_campaign(db, user_email: str, user_data: Dict[str, Any])
                 {
                     "$set": {
                         "current_step": next_step,
-                        "next_email_at": next_email_at.isoformat(),
-                        "last_email_sent": datetime.now(timezone.utc).isoformat()
+                        "next_email_at": next_email_at,
+                        "last_email_sent": datetime.now(timezone.utc)
                     }
                 }
             )
@@ -440,7 +442,7 @@ async def process_drip_campaign(db, user_email: str, user_data: Dict[str, Any])
                     "$set": {
                         "status": "completed",
                         "current_step": next_step,
-                        "completed_at": datetime.now(timezone.utc).isoformat()
+                        "completed_at": datetime.now(timezone.utc)
                     }
                 }
             )
@@ -470,8 +472,8 @@ async def check_and_start_drip_campaign(db, user_email: str) -> Optional[str]:
     )
     
     if last_drip:
-        last_drip_time = datetime.fromisoformat(last_drip.get("created_at", "2000-01-01T00:00:00+00:00"))
-        if datetime.now(timezone.utc) - last_drip_time < timedelta(days=DRIP_CONFIG["cooldown_days"]):
+        last_drip_time = parse_optional(last_drip.get("created_at"))
+        if last_drip_time and datetime.now(timezone.utc) - last_drip_time < timedelta(days=DRIP_CONFIG["cooldown_days"]):
             return None
     
     # Check pricing events
@@ -495,7 +497,7 @@ async def check_and_start_drip_campaign(db, user_email: str) -> Optional[str]:
         return None
     
     # Check if 72 hours have passed since pricing_viewed
-    pricing_time = datetime.fromisoformat(pricing_event.get("timestamp"))
+    pricing_time = to_datetime(pricing_event.get("timestamp"))
     # For testing, we can reduce this. In production, use full 72 hours
     # if datetime.now(timezone.utc) - pricing_time < timedelta(hours=DRIP_CONFIG["trigger_after_hours"]):
     #     return None
@@ -509,8 +511,8 @@ async def check_and_start_drip_campaign(db, user_email: str) -> Optional[str]:
         "user_email": user_email,
         "status": "active",
         "current_step": 0,
-        "next_email_at": first_email_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "next_email_at": first_email_at,
+        "created_at": datetime.now(timezone.utc),
         "trigger_event": "pricing_abandonment"
     })
     
@@ -526,7 +528,7 @@ async def stop_drip_campaign(db, user_email: str, reason: str = "upgraded") -> b
         {
             "$set": {
                 "status": "cancelled",
-                "cancelled_at": datetime.now(timezone.utc).isoformat(),
+                "cancelled_at": datetime.now(timezone.utc),
                 "cancel_reason": reason
             }
         }
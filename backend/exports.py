@@ -0,0 +1,211 @@
+"""
+Streaming Exports for Postify AI
+Exports read their documents through an async Mongo cursor (projected to the
+exported fields, fetched in batches) and stream them out as CSV, NDJSON or a
+JSON envelope while they are read. Memory stays flat whatever the history
+size, and there is no row cap. When the client accepts gzip the body is
+compressed on the fly, with a sync flush per chunk so bytes keep flowing.
+"""
+
+import io
+import os
+import csv
+import json
+import zlib
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Callable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from timestamps import parse_optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))  # Documents per cursor round trip
+EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', '6'))
+
+CSV = "csv"
+NDJSON = "ndjson"
+JSON = "json"
+MEDIA_TYPES = {
+    CSV: "text/csv; charset=utf-8",
+    NDJSON: "application/x-ndjson",
+    JSON: "application/json",
+}
+
+# (NDJSON key, CSV header, value getter)
+Column = Tuple[str, str, Callable[[Dict[str, Any]], Any]]
+
+
+class EmptyExport(Exception):
+    pass
+
+
+# ============= COLUMNS =============
+
+CONTENT_TYPE_LABELS = {
+    "social_post": "Social Media Post",
+    "video_idea": "Video Ideas",
+    "product_description": "Product Description"
+}
+
+
+def _history_date(doc: Dict[str, Any]) -> str:
+    created = parse_optional(doc.get("created_at"))
+    return created.strftime("%Y-%m-%d %H:%M") if created else str(doc.get("created_at") or "")
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+HISTORY_COLUMNS: List[Column] = [
+    ("created_at", "Date", _history_date),
+    ("content_type", "Tool", lambda doc: CONTENT_TYPE_LABELS.get(doc.get("content_type", ""), doc.get("content_type", ""))),
+    ("topic", "Topic", lambda doc: doc.get("topic", "")),
+    ("tone", "Tone", lambda doc: doc.get("tone", "neutral")),
+    ("generated_content", "Generated Content", lambda doc: (doc.get("generated_content") or "").replace("\n", " ")),
+    ("tokens_used", "Tokens Used", lambda doc: doc.get("tokens_used", 0)),
+]
+HISTORY_PROJECTION = {
+    "_id": 0, "created_at": 1, "content_type": 1, "topic": 1, "tone": 1, "generated_content": 1, "tokens_used": 1
+}
+
+ANALYTICS_COLUMNS: List[Column] = [
+    (field, field, lambda doc, field=field: _isoformat(doc.get(field, "")))
+    for field in ["created_at", "content_type", "platform", "tone", "topic"]
+]
+
+
+# ============= ENCODING =============
+
+class _CsvLine:
+    """csv.writer over a reusable buffer: one properly quoted line per call"""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def __call__(self, values: List[Any]) -> str:
+        self._writer.writerow(values)
+        line = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return line
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def json_dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+async def first_document(cursor) -> Dict[str, Any]:
+    """Pull the first document so an empty export can still be answered with an error"""
+    try:
+        return await cursor.next()
+    except StopAsyncIteration:
+        raise EmptyExport()
+
+
+async def _documents(cursor, first: Optional[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    try:
+        if first is not None:
+            yield first
+        async for doc in cursor:
+            yield doc
+    finally:
+        # Client went away mid-download: release the server-side cursor
+        await cursor.close()
+
+
+async def csv_lines(cursor, columns: List[Column], first: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    line = _CsvLine()
+    yield line([header for _, header, _ in columns])
+    async for doc in _documents(cursor, first):
+        yield line([value(doc) for _, _, value in columns])
+
+
+async def ndjson_lines(cursor, columns: Optional[List[Column]] = None, first: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """One JSON object per line; whole documents unless columns are given"""
+    async for doc in _documents(cursor, first):
+        row = {key: value(doc) for key, _, value in columns} if columns else doc
+        yield json_dumps(row) + "\n"
+
+
+async def json_envelope(cursor, meta: Dict[str, Any], first: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """{**meta, "data": [...], "count": n}, written as the documents arrive"""
+    opening = json_dumps(meta)[:-1] + (", " if meta else "")
+    yield opening + '"data": ['
+    count = 0
+    async for doc in _documents(cursor, first):
+        yield ("," if count else "") + json_dumps(doc)
+        count += 1
+    yield f'], "count": {count}}}'
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True when Accept-Encoding allows gzip, by name or through *, with a non-zero q"""
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.replace(" ", "").lower()
+        return not (q.startswith("q=") and q[2:].strip("0.") == "")
+    return False
+
+
+async def encode_chunks(lines: AsyncIterator[str], gzip: bool = False) -> AsyncIterator[bytes]:
+    """
+    Batch text lines into ~EXPORT_CHUNK_BYTES chunks. The first line goes out
+    on its own so the download starts right away.
+    """
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None  # 31: gzip container
+
+    def encode(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    pending: List[bytes] = []
+    size = 0
+    started = False
+    async for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if not started or size >= EXPORT_CHUNK_BYTES:
+            yield encode(b"".join(pending))
+            pending, size, started = [], 0, True
+    tail = b"".join(pending)
+    if compressor is not None:
+        tail = compressor.compress(tail) + compressor.flush()
+    if tail:
+        yield tail
+
+
+def export_response(
+    lines: AsyncIterator[str],
+    fmt: str,
+    accept_encoding: Optional[str] = None,
+    filename: Optional[str] = None
+) -> StreamingResponse:
+    """Stream lines as the response body, gzipped when the client accepts it"""
+    gzip = accepts_gzip(accept_encoding)
+    headers = {
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+        "X-Accel-Buffering": "no"  # Keep reverse proxies from holding the stream back
+    }
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(encode_chunks(lines, gzip), media_type=MEDIA_TYPES[fmt], headers=headers)
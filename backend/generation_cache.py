@@ -0,0 +1,173 @@
+"""
+Generation Cache for Postify AI
+Exact-match cache of LLM text generations, keyed by a fingerprint of the
+rendered system prompt, normalized user prompt, model, max_tokens and
+temperature bucket.
+
+Every fresh generation is stored as a variant; each key keeps the
+GENERATION_CACHE_VARIANTS most recent ones and expires after
+GENERATION_CACHE_TTL_SECONDS of inactivity (TTL index on expires_at).
+Variants are only served when the request opts in ("instant" mode), and a
+variant the user has not seen yet is preferred.
+
+Usage:
+    python generation_cache.py stats [--days 7]
+"""
+
+import os
+import re
+import sys
+import json
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GENERATION_CACHE_ENABLED = os.environ.get('GENERATION_CACHE_ENABLED', 'true').lower() == 'true'
+GENERATION_CACHE_VARIANTS = int(os.environ.get('GENERATION_CACHE_VARIANTS', '5'))
+GENERATION_CACHE_TTL_SECONDS = int(os.environ.get('GENERATION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+GENERATION_CACHE_MAX_BYTES = int(os.environ.get('GENERATION_CACHE_MAX_BYTES', '16384'))  # Larger outputs are not cached
+SHOWN_TO_LIMIT = 50  # Users remembered per variant
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case and whitespace differences should not change the fingerprint"""
+    return _WHITESPACE.sub(" ", prompt).strip().casefold()
+
+
+def temperature_bucket(temperature: float) -> str:
+    return f"{round(temperature, 1):.1f}"
+
+
+def fingerprint(system_prompt: str, user_prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+    material = json.dumps(
+        [system_prompt, normalize_prompt(user_prompt), model, max_tokens, temperature_bucket(temperature)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def _count(db, **increments: int) -> None:
+    """Add to today's cache metrics"""
+    try:
+        await db.generation_cache_stats.update_one(
+            {"_id": datetime.now(timezone.utc).strftime("%Y-%m-%d")},
+            {"$inc": increments},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"Generation cache metrics update failed: {e}")
+
+
+async def lookup(db, key: str, user_email: str) -> Optional[Dict[str, Any]]:
+    """
+    Pick a cached variant for an instant-mode request, preferring one this
+    user has not been shown. Returns {"id", "content", "tokens_used"} or None.
+    """
+    if not GENERATION_CACHE_ENABLED:
+        return None
+    try:
+        entry = await db.generation_cache.find_one({"_id": key}, {"variants": 1})
+        variants = (entry or {}).get("variants") or []
+        if not variants:
+            await _count(db, lookups=1, misses=1)
+            return None
+
+        unseen = [v for v in variants if user_email not in v.get("shown_to", [])]
+        variant = random.choice(unseen or variants)
+        await db.generation_cache.update_one(
+            {"_id": key},
+            {
+                "$push": {"variants.$[v].shown_to": {"$each": [user_email], "$slice": -SHOWN_TO_LIMIT}},
+                "$inc": {"variants.$[v].hits": 1},
+                "$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=GENERATION_CACHE_TTL_SECONDS)}
+            },
+            array_filters=[{"v.id": variant["id"]}]
+        )
+        await _count(db, lookups=1, hits=1, llm_calls_saved=1, tokens_saved=variant.get("tokens_used", 0))
+    except Exception as e:
+        # A cache failure must never fail the generation; treat it as a miss
+        logger.warning(f"Generation cache lookup failed: {e}")
+        return None
+    return {"id": variant["id"], "content": variant["content"], "tokens_used": variant.get("tokens_used", 0)}
+
+
+async def store(db, key: str, user_email: str, content: str, tokens_used: int) -> None:
+    """Add a fresh generation as the newest variant of its key"""
+    if not GENERATION_CACHE_ENABLED or len(content.encode("utf-8")) > GENERATION_CACHE_MAX_BYTES:
+        return
+    now = datetime.now(timezone.utc)
+    variant = {
+        "id": str(uuid.uuid4()),
+        "content": content,
+        "tokens_used": tokens_used,
+        "shown_to": [user_email],
+        "hits": 0,
+        "created_at": now
+    }
+    try:
+        await db.generation_cache.update_one(
+            {"_id": key},
+            {
+                "$push": {"variants": {"$each": [variant], "$slice": -GENERATION_CACHE_VARIANTS}},
+                "$set": {"updated_at": now, "expires_at": now + timedelta(seconds=GENERATION_CACHE_TTL_SECONDS)},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+        await _count(db, stores=1)
+    except Exception as e:
+        # A cache write must never fail the generation
+        logger.warning(f"Generation cache store failed: {e}")
+
+
+async def stats(db, days: int = 7) -> List[Dict[str, Any]]:
+    """Daily metrics, newest first, with hit rate"""
+    rows = await db.generation_cache_stats.find({}).sort("_id", -1).limit(days).to_list(days)
+    return [
+        {
+            "date": row["_id"],
+            "lookups": row.get("lookups", 0),
+            "hits": row.get("hits", 0),
+            "hit_rate": round(row.get("hits", 0) / row["lookups"], 3) if row.get("lookups") else 0.0,
+            "llm_calls_saved": row.get("llm_calls_saved", 0),
+            "tokens_saved": row.get("tokens_saved", 0),
+            "stores": row.get("stores", 0)
+        }
+        for row in rows
+    ]
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        for row in await stats(db, args.days):
+            print(f"{row['date']}  lookups={row['lookups']} hit_rate={row['hit_rate']:.1%} "
+                  f"llm_calls_saved={row['llm_calls_saved']} tokens_saved={row['tokens_saved']} stores={row['stores']}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generation cache metrics")
+    parser.add_argument("command", choices=["stats"])
+    parser.add_argument("--days", type=int, default=7)
+    sys.exit(asyncio.run(_main(parser.parse_args())))
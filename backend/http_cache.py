@@ -0,0 +1,50 @@
+"""
+HTTP Caching for Postify AI
+Constant API payloads serialized once to bytes, with a strong ETag, so
+catalogue endpoints answer without rebuilding or re-encoding anything and
+conditional requests (If-None-Match) get a bodyless 304.
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+# Configuration
+CATALOGUE_MAX_AGE_SECONDS = int(os.environ.get('CATALOGUE_MAX_AGE_SECONDS', '300'))
+
+PUBLIC_CACHE_CONTROL = f"public, max-age={CATALOGUE_MAX_AGE_SECONDS}"
+# Per-user payloads: cache in the browser only, and revalidate every time (plan may change)
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+class StaticPayload:
+    """A JSON body encoded once, plus its strong ETag"""
+
+    def __init__(self, content: Any, cache_control: str = PUBLIC_CACHE_CONTROL):
+        # Same encoding FastAPI's JSONResponse uses
+        self.body = json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.cache_control = cache_control
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def respond(request: Request, payload: StaticPayload) -> Response:
+    """200 with the precomputed body, or 304 if the client already has it"""
+    headers = {"ETag": payload.etag, "Cache-Control": payload.cache_control}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
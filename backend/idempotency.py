@@ -0,0 +1,148 @@
+"""
+Idempotency & Request Coalescing for Postify AI
+Generation endpoints accept an Idempotency-Key header. The first request with
+a key runs; retries with the same key get the stored result instead of a
+second LLM call and a second usage charge. Keys live in `idempotency_keys`
+(unique per user, removed by a TTL index).
+
+Independently, concurrent identical requests from one user in this process
+share a single in-flight call (single-flight), with or without a key.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '3600'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '120'))  # How long a retry waits for the original
+IDEMPOTENCY_POLL_SECONDS = 0.5
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """Key misuse or a still-running original request; carries the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# single-flight key -> future of the in-flight call
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def request_fingerprint(scope: str, payload: Dict[str, Any]) -> str:
+    material = json.dumps([scope, payload], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def single_flight(key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    """Run func, or join an identical call already in flight in this process"""
+    future = _inflight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await func()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Retrieved here so an unawaited future does not log a warning
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _claim(db, user_email: str, key: str, scope: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Claim a key for this request. Returns None when claimed, or the stored
+    response of a completed earlier request. Waits while another request holds it.
+    """
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.idempotency_keys.insert_one({
+                "user_email": user_email,
+                "key": key,
+                "scope": scope,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        existing = await db.idempotency_keys.find_one({"user_email": user_email, "key": key}, {"_id": 0})
+        if existing is None:
+            continue  # Original failed and released the key; claim it ourselves
+        if existing["scope"] != scope or existing["fingerprint"] != fingerprint:
+            raise IdempotencyError(422, "Idempotency-Key was already used for a different request")
+        if existing["status"] == "done":
+            logger.info(f"Idempotent replay: {scope} key={key} user={user_email}")
+            return existing["response"]
+        if asyncio.get_running_loop().time() >= deadline:
+            raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+async def _run_with_key(db, user_email: str, key: str, scope: str, fingerprint: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    stored = await _claim(db, user_email, key, scope, fingerprint)
+    if stored is not None:
+        return stored
+
+    try:
+        result = await func()
+    except BaseException:
+        # Failed requests do not consume the key, so the client can retry
+        await db.idempotency_keys.delete_one({"user_email": user_email, "key": key, "status": "in_progress"})
+        raise
+
+    await db.idempotency_keys.update_one(
+        {"user_email": user_email, "key": key},
+        {"$set": {"status": "done", "response": result, "completed_at": datetime.now(timezone.utc)}}
+    )
+    return result
+
+
+async def run(
+    db,
+    user_email: str,
+    scope: str,
+    idempotency_key: Optional[str],
+    payload: Dict[str, Any],
+    func: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Execute a generation at most once per Idempotency-Key, and at most once
+    concurrently per identical payload. func must return a BSON-encodable dict.
+    """
+    fingerprint = request_fingerprint(scope, payload)
+    if not idempotency_key:
+        return await single_flight(f"{user_email}:{fingerprint}", func)
+
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must not exceed {MAX_KEY_LENGTH} characters")
+    return await single_flight(
+        f"{user_email}:key:{idempotency_key}",
+        lambda: _run_with_key(db, user_email, idempotency_key, scope, fingerprint, func)
+    )
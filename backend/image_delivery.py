@@ -0,0 +1,233 @@
+"""
+Image Delivery for Postify AI
+Streams image downloads chunk by chunk with Range, ETag/If-None-Match and
+Content-Length support, so memory per download is constant.
+
+Stored images stream straight from the image store. Legacy rows that still
+point at a provider URL are streamed through the shared connection pool and
+kept in a bounded on-disk LRU cache, so repeat downloads skip the upstream.
+"""
+
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Tuple, Dict
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+import image_store
+from http_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DOWNLOAD_CACHE_DIR = Path(os.environ.get('DOWNLOAD_CACHE_DIR', str(Path(__file__).parent / 'download_cache')))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+DOWNLOAD_CACHE_CONTROL = "private, max-age=86400"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single `bytes=` range, or None for the whole
+    body. Multi-range requests are answered with the whole body, as RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[6:].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            length = int(end_s)  # Suffix range: last N bytes
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(0, size - length), size - 1
+    except ValueError:
+        return None
+    if start > end:
+        return None  # Invalid range syntax: ignore the header
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def ranged_response(
+    request: Request,
+    size: int,
+    etag: str,
+    content_type: str,
+    iter_range,
+    headers: Dict[str, str]
+) -> Response:
+    """Build a 200/206/304/416 response around iter_range(start, end)"""
+    headers = {**headers, "ETag": etag, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None  # Client's copy is stale: send the whole image
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_range(start, end), status_code=status_code, media_type=content_type, headers=headers)
+
+
+async def stored_image_response(
+    request: Request,
+    key: str,
+    content_type: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Stream a content-addressed image; its key is a perfect strong ETag"""
+    size = await image_store.get_size(key)
+    content_type = content_type or await image_store.get_content_type(key)
+    return ranged_response(
+        request, size, f'"{key}"', content_type,
+        lambda start, end: image_store.backend.iter_range(key, start, end),
+        headers or {}
+    )
+
+
+# ============= REMOTE URL CACHE =============
+
+class DiskLRU:
+    """Files named by URL hash; mtime is the recency, total size is bounded"""
+
+    def __init__(self, root: Path = DOWNLOAD_CACHE_DIR, max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, url: str) -> Path:
+        return self.root / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> Optional[Path]:
+        path = self.path(url)
+        try:
+            os.utime(path)  # Mark as recently used
+            return path
+        except FileNotFoundError:
+            return None
+
+    def temp_path(self, url: str) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.path(url).with_suffix(f".{uuid.uuid4().hex}.tmp")
+
+    def commit(self, tmp: Path, url: str) -> Path:
+        path = self.path(url)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """Drop least recently used files until the cache fits"""
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+download_cache = DiskLRU()
+
+
+def _open(path: Optional[Path]) -> Optional[int]:
+    if path is None:
+        return None
+    try:
+        return os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None  # Evicted since lookup
+
+
+def _open_and_commit(tmp: Path, url: str) -> int:
+    """Open the finished download, then publish it; eviction only unlinks, so the handle stays readable"""
+    fd = os.open(tmp, os.O_RDONLY)
+    try:
+        download_cache.commit(tmp, url)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+async def _fill_cache(url: str) -> int:
+    """Stream an upstream image to disk, chunk by chunk, and return an open handle to it"""
+    tmp = await asyncio.to_thread(download_cache.temp_path, url)
+    try:
+        async with image_store.http_client().stream("GET", url) as upstream:
+            upstream.raise_for_status()
+            written = 0
+            with open(tmp, "wb") as f:
+                async for chunk in upstream.aiter_bytes(image_store.CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > image_store.IMAGE_MAX_BYTES:
+                        raise ImageTooLarge(f"Upstream image exceeds {image_store.IMAGE_MAX_BYTES} bytes")
+                    await asyncio.to_thread(f.write, chunk)
+        return await asyncio.to_thread(_open_and_commit, tmp, url)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _file_info(fd: int) -> Tuple[int, str]:
+    return os.fstat(fd).st_size, image_store.sniff_content_type(os.pread(fd, 16, 0))
+
+
+async def remote_image_response(request: Request, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a provider URL from the disk cache, fetching it once on a miss"""
+    path = await asyncio.to_thread(download_cache.lookup, url)
+    fd = await asyncio.to_thread(_open, path)
+    if fd is None:
+        fd = await _fill_cache(url)
+    try:
+        size, content_type = await asyncio.to_thread(_file_info, fd)
+        etag = f'"url-{download_cache.path(url).name[:32]}"'
+        response = ranged_response(
+            request, size, etag, content_type,
+            lambda start, end: image_store.iter_fd_range(fd, start, end),
+            {"Cache-Control": DOWNLOAD_CACHE_CONTROL, **(headers or {})}
+        )
+    except BaseException:
+        os.close(fd)
+        raise
+    if isinstance(response, StreamingResponse):
+        # Streams from the open handle, so a concurrent eviction cannot cut the body short
+        response.background = BackgroundTask(os.close, fd)
+    else:
+        os.close(fd)
+    return response
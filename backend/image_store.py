@@ -0,0 +1,430 @@
+"""
+Image Store for Postify AI
+Generated images are stored once, content-addressed by SHA-256, instead of
+keeping base64 data: URLs or expiring provider URLs in Mongo. Documents
+keep only `image_key` plus metadata; image_url is derived when reading.
+
+Backends (IMAGE_STORE_BACKEND):
+    local   - files under IMAGE_STORE_DIR (default)
+    gridfs  - GridFS bucket `images` in the app database
+    s3      - any S3-compatible store (IMAGE_STORE_S3_BUCKET, IMAGE_STORE_S3_ENDPOINT)
+
+Usage:
+    python image_store.py migrate [--batch-size 100] [--restart]
+    python image_store.py status
+"""
+
+import os
+import re
+import sys
+import uuid
+import base64
+import asyncio
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, AsyncIterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+IMAGE_STORE_BACKEND = os.environ.get('IMAGE_STORE_BACKEND', 'local').lower()
+IMAGE_STORE_DIR = Path(os.environ.get('IMAGE_STORE_DIR', str(Path(__file__).parent / 'image_store_data')))
+IMAGE_STORE_S3_BUCKET = os.environ.get('IMAGE_STORE_S3_BUCKET', 'postify-images')
+IMAGE_STORE_S3_ENDPOINT = os.environ.get('IMAGE_STORE_S3_ENDPOINT')  # e.g. a local MinIO
+IMAGE_PUBLIC_BASE_URL = os.environ.get('IMAGE_PUBLIC_BASE_URL', '').rstrip('/')  # Empty: backend-relative /api/images/..., resolved by the frontend
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', '30'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(25 * 1024 * 1024)))
+
+MIGRATION_ID = "image_store"
+MIGRATION_CONCURRENCY = int(os.environ.get('IMAGE_MIGRATION_CONCURRENCY', '4'))
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+def image_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Content type from magic bytes; stored images are PNG unless proven otherwise"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/png"
+
+
+async def iter_fd_range(fd: int, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes [start, end] of an open file in chunks; the caller owns fd"""
+    offset = start
+    while offset <= end:
+        chunk = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, end - offset + 1), offset)
+        if not chunk:
+            break
+        offset += len(chunk)
+        yield chunk
+
+
+async def iter_file_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes [start, end] of a file in chunks, without loading it whole"""
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        async for chunk in iter_fd_range(fd, start, end):
+            yield chunk
+    finally:
+        os.close(fd)
+
+
+# ============= BACKENDS =============
+# Each backend: exists, put, get, size, iter_range (inclusive byte range)
+
+class LocalBackend:
+    """Files sharded by key prefix: <root>/ab/cd/<key>"""
+
+    def __init__(self, root: Path = IMAGE_STORE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).exists)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per write: concurrent puts of the same key must not share a temp file
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)  # Atomic: readers never see a partial file
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return await asyncio.to_thread(self._path(key).read_bytes)
+        except FileNotFoundError:
+            raise ImageNotFound(key)
+
+    async def size(self, key: str) -> int:
+        try:
+            return await asyncio.to_thread(os.path.getsize, self._path(key))
+        except FileNotFoundError:
+            raise ImageNotFound(key)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        async for chunk in iter_file_range(self._path(key), start, end):
+            yield chunk
+
+
+class GridFSBackend:
+    """GridFS bucket keyed by _id = image key"""
+
+    def __init__(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        self.db = db
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name="images")
+
+    async def exists(self, key: str) -> bool:
+        return await self.db["images.files"].find_one({"_id": key}, {"_id": 1}) is not None
+
+    async def put(self, key: str, data: bytes) -> None:
+        from pymongo.errors import DuplicateKeyError
+        try:
+            await self.bucket.upload_from_stream_with_id(key, key, data)
+        except DuplicateKeyError:
+            pass  # Same key, same bytes
+
+    async def get(self, key: str) -> bytes:
+        from gridfs.errors import NoFile
+        try:
+            stream = await self.bucket.open_download_stream(key)
+        except NoFile:
+            raise ImageNotFound(key)
+        return await stream.read()
+
+    async def size(self, key: str) -> int:
+        doc = await self.db["images.files"].find_one({"_id": key}, {"length": 1})
+        if doc is None:
+            raise ImageNotFound(key)
+        return doc["length"]
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        stream = await self.bucket.open_download_stream(key)
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class S3Backend:
+    """S3-compatible object store; boto3 calls run in a thread"""
+
+    def __init__(self, bucket: str = IMAGE_STORE_S3_BUCKET, endpoint_url: Optional[str] = IMAGE_STORE_S3_ENDPOINT):
+        import boto3
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(
+            self.client.put_object, Bucket=self.bucket, Key=key, Body=data, ContentType=sniff_content_type(data)
+        )
+
+    async def get(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        except ClientError:
+            raise ImageNotFound(key)
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def size(self, key: str) -> int:
+        from botocore.exceptions import ClientError
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError:
+            raise ImageNotFound(key)
+        return response["ContentLength"]
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}"
+        )
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+
+backend = None
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def http_client() -> httpx.AsyncClient:
+    """Pooled client for fetching provider images, shared by every request"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=IMAGE_FETCH_TIMEOUT, follow_redirects=True)
+    return _http_client
+
+
+async def aclose() -> None:
+    if _http_client is not None:
+        await _http_client.aclose()
+
+
+def configure(db):
+    """Build the process-wide backend from IMAGE_STORE_BACKEND"""
+    global backend
+    if IMAGE_STORE_BACKEND == "gridfs":
+        backend = GridFSBackend(db)
+    elif IMAGE_STORE_BACKEND == "s3":
+        backend = S3Backend()
+    else:
+        if IMAGE_STORE_BACKEND != "local":
+            logger.warning(f"Unknown IMAGE_STORE_BACKEND '{IMAGE_STORE_BACKEND}', using local")
+        backend = LocalBackend()
+    logger.info(f"Image store backend: {type(backend).__name__}")
+    return backend
+
+
+# ============= STORE API =============
+
+async def put_bytes(data: bytes) -> Dict[str, Any]:
+    """Store image bytes once. Returns the metadata documents keep."""
+    if len(data) > IMAGE_MAX_BYTES:
+        raise ValueError(f"Image too large ({len(data)} bytes)")
+    key = image_key(data)
+    if not await backend.exists(key):
+        await backend.put(key, data)
+    return {"image_key": key, "content_type": sniff_content_type(data), "image_bytes": len(data)}
+
+
+async def fetch_bytes(image_url: str) -> bytes:
+    """Bytes behind a data: URL or an http(s) URL"""
+    if image_url.startswith("data:"):
+        _, data = image_url.split(",", 1)
+        return base64.b64decode(data)
+    response = await http_client().get(image_url)
+    response.raise_for_status()
+    return response.content
+
+
+async def ingest(image_url: str) -> Dict[str, Any]:
+    """Fetch or decode a freshly generated image and store it"""
+    return await put_bytes(await fetch_bytes(image_url))
+
+
+async def get_bytes(key: str) -> bytes:
+    if not KEY_PATTERN.match(key):
+        raise ImageNotFound(key)
+    return await backend.get(key)
+
+
+async def get_size(key: str) -> int:
+    if not KEY_PATTERN.match(key):
+        raise ImageNotFound(key)
+    return await backend.size(key)
+
+
+async def get_content_type(key: str) -> str:
+    """Sniff from the first bytes, without reading the whole image"""
+    head = b"".join([chunk async for chunk in backend.iter_range(key, 0, 15)])
+    return sniff_content_type(head)
+
+
+def url_for(key: str) -> str:
+    """Public URL of a stored image. Keys are unguessable content hashes, so no auth is needed."""
+    return f"{IMAGE_PUBLIC_BASE_URL}/api/images/{key}"
+
+
+def with_image_url(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill image_url for documents that only carry image_key (legacy rows keep theirs)"""
+    if doc.get("image_key"):
+        doc["image_url"] = url_for(doc["image_key"])
+    return doc
+
+
+async def stored_image_fields(image_url: str) -> Dict[str, Any]:
+    """
+    Fields to save on a new image document. Falls back to the provider URL if
+    storing fails, so a generation is never lost to a storage error.
+    """
+    try:
+        return await ingest(image_url)
+    except Exception as e:
+        logger.error(f"Image store ingest failed, keeping provider URL: {e}")
+        return {"image_url": image_url}
+
+
+# ============= MIGRATION =============
+
+async def _migrate_one(db, doc: Dict[str, Any], semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        try:
+            fields = await ingest(doc["image_url"])
+        except Exception as e:
+            await db.image_generations.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"image_migration_error": str(e)[:200]}}
+            )
+            return False
+    # Conditional on the original URL, so a concurrent rewrite wins
+    result = await db.image_generations.update_one(
+        {"_id": doc["_id"], "image_url": doc["image_url"]},
+        {"$set": fields, "$unset": {"image_url": "", "image_base64": "", "image_migration_error": ""}}
+    )
+    return result.modified_count == 1
+
+
+async def migrate(db, batch_size: int = 100, restart: bool = False) -> Dict[str, Any]:
+    """
+    Move every image_generations row with an inline or provider URL into the
+    store, in _id order with a checkpoint in `migrations`. Rows whose URL can no
+    longer be fetched keep it and get image_migration_error.
+    """
+    checkpoint_id = f"{MIGRATION_ID}:image_generations"
+    if restart:
+        await db.migrations.delete_one({"_id": checkpoint_id})
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    migrated = checkpoint.get("migrated", 0)
+    failed = checkpoint.get("failed", 0)
+    semaphore = asyncio.Semaphore(MIGRATION_CONCURRENCY)
+
+    while True:
+        query: Dict[str, Any] = {"image_key": {"$exists": False}, "image_url": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await db.image_generations.find(query, {"image_url": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        results = await asyncio.gather(*(_migrate_one(db, doc, semaphore) for doc in docs))
+        migrated += sum(results)
+        failed += len(results) - sum(results)
+        last_id = docs[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "migrated": migrated, "failed": failed, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"migrated": migrated, "failed": failed, "finished_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"Image store migration: {migrated} migrated, {failed} failed")
+    return {"migrated": migrated, "failed": failed}
+
+
+async def run_migration_job(db, job: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """Job handler: run the migration in the background"""
+    return await migrate(db, job["payload"].get("batch_size", 100), job["payload"].get("restart", False))
+
+
+async def remaining(db) -> int:
+    return await db.image_generations.count_documents({"image_key": {"$exists": False}, "image_url": {"$type": "string"}})
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    configure(db)
+
+    try:
+        if args.command == "migrate":
+            result = await migrate(db, args.batch_size, args.restart)
+            print(f"{result['migrated']} images migrated, {result['failed']} failed")
+        print(f"{await remaining(db)} image documents without a stored image")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move generated images into the content-addressed store")
+    parser.add_argument("command", choices=["migrate", "status"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rescan from the start")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,134 @@
+"""
+Image Variants for Postify AI
+Grids (image history, brand library) do not need full 1024-1536px PNGs.
+Each stored image gets smaller WebP renditions, derived once and stored in
+the image store like any other image:
+
+    thumb   - 256px wide, for grid tiles
+    medium  - 768px wide, for previews and lightboxes
+
+A variant's key is the hash of the original key plus the variant spec, so
+changing a spec produces new keys instead of serving stale files. Variants
+are warmed in the background when an image is generated, and derived on
+first request otherwise. Encoding is CPU-bound and runs in a process pool.
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, Set
+
+from PIL import Image
+
+import image_store
+from idempotency import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+
+VARIANTS = {
+    "thumb": {"width": 256, "quality": 70},
+    "medium": {"width": 768, "quality": 80},
+}
+VARIANT_CONTENT_TYPE = "image/webp"
+
+
+class UnknownVariant(Exception):
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_warming: Set[asyncio.Task] = set()  # Strong refs so background warm-ups are not collected
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and driver threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown() -> None:
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def encode_webp(data: bytes, width: int, quality: int) -> bytes:
+    """Downscale to at most `width` pixels wide and encode as WebP (runs in a worker process)"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (width, width))  # Lets JPEG decode at reduced size
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=quality, method=4)
+        return output.getvalue()
+
+
+def variant_key(key: str, variant: str) -> str:
+    spec = VARIANTS[variant]
+    material = f"{key}:{variant}:w{spec['width']}:q{spec['quality']}:webp"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def variant_url(key: str, variant: str) -> str:
+    return f"{image_store.url_for(key)}/{variant}"
+
+
+def with_variants(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Add variant URLs next to image_url for documents backed by the image store"""
+    if doc.get("image_key"):
+        doc["variants"] = {variant: variant_url(doc["image_key"], variant) for variant in VARIANTS}
+    return doc
+
+
+async def _derive(key: str, variant: str, target: str) -> str:
+    if await image_store.backend.exists(target):
+        return target
+    spec = VARIANTS[variant]
+    data = await image_store.get_bytes(key)
+    loop = asyncio.get_running_loop()
+    encoded = await loop.run_in_executor(_get_executor(), encode_webp, data, spec["width"], spec["quality"])
+    await image_store.backend.put(target, encoded)
+    logger.info(f"Image variant derived: {key[:12]} {variant} {len(data)} -> {len(encoded)} bytes")
+    return target
+
+
+async def ensure_variant(key: str, variant: str) -> str:
+    """Key of the stored variant, deriving it on first use. Concurrent requests share one encode."""
+    if variant not in VARIANTS:
+        raise UnknownVariant(variant)
+    if not image_store.KEY_PATTERN.match(key):
+        raise image_store.ImageNotFound(key)
+    target = variant_key(key, variant)
+    return await single_flight(f"variant:{target}", lambda: _derive(key, variant, target))
+
+
+async def _warm(key: str) -> None:
+    for variant in VARIANTS:
+        try:
+            await ensure_variant(key, variant)
+        except Exception as e:
+            # The lazy path will retry on first request
+            logger.warning(f"Image variant warm-up failed for {key[:12]} {variant}: {e}")
+
+
+def warm(doc: Dict[str, Any]) -> None:
+    """Derive all variants of a freshly generated image in the background"""
+    if not doc.get("image_key"):
+        return
+    task = asyncio.create_task(_warm(doc["image_key"]))
+    _warming.add(task)
+    task.add_done_callback(_warming.discard)
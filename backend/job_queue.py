@@ -0,0 +1,316 @@
+"""
+Background Job Queue for Postify AI
+Mongo-backed durable queue: leased jobs with heartbeats, retry with exponential
+backoff and a dead-letter state. Used for long-running generations and for
+nightly maintenance (schedule_daily).
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', '15'))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '1.0'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get('JOB_RETRY_BASE_SECONDS', '10'))
+JOB_RETRY_MAX_SECONDS = int(os.environ.get('JOB_RETRY_MAX_SECONDS', '600'))
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"  # Exhausted retries - kept for inspection
+ACTIVE_STATUSES = [QUEUED, RUNNING]
+
+# Fields returned by the public job status endpoint
+PUBLIC_JOB_FIELDS = {
+    "_id": 0, "id": 1, "type": 1, "status": 1, "attempts": 1, "max_attempts": 1,
+    "progress": 1, "result": 1, "error": 1, "created_at": 1, "updated_at": 1, "finished_at": 1
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> int:
+    """Exponential backoff in seconds for the given attempt number (1-based)"""
+    return min(JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), JOB_RETRY_MAX_SECONDS)
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting"""
+
+    def __init__(self, db, job: Dict[str, Any], worker_id: str):
+        self.db = db
+        self.job = job
+        self.worker_id = worker_id
+
+    @property
+    def is_last_attempt(self) -> bool:
+        return self.job.get("attempts", 1) >= self.job.get("max_attempts", JOB_MAX_ATTEMPTS)
+
+    async def progress(self, done: int, total: int, partial: Any = None) -> bool:
+        """Record progress (doubles as a heartbeat). Returns False if the lease was lost."""
+        progress = {"done": done, "total": total}
+        if partial is not None:
+            progress["partial"] = partial
+        return await update_progress(self.db, self.job["id"], self.worker_id, progress)
+
+
+async def enqueue(
+    db,
+    job_type: str,
+    payload: Dict[str, Any],
+    user_email: Optional[str] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    run_at: Optional[datetime] = None,
+    job_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Insert a new job and return it. A fixed job_id makes the insert fail with DuplicateKeyError if it exists."""
+    now = _now()
+    job = {
+        "id": job_id or str(uuid.uuid4()),
+        "type": job_type,
+        "user_email": user_email,
+        "payload": payload,
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": (run_at or now),
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "progress": {"done": 0, "total": 0},
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.jobs.insert_one(job)
+    job.pop("_id", None)
+    logger.info(f"Job enqueued: {job['id']} type={job_type} user={user_email}")
+    return job
+
+
+async def schedule_daily(
+    db,
+    job_type: str,
+    hour_utc: int,
+    payload: Optional[Dict[str, Any]] = None,
+    after: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Queue the next run of a nightly job at hour_utc:00 UTC. The job id is
+    derived from the type and date, so every node can call this at startup and
+    a day is only ever queued once. The job reschedules itself when it finishes.
+    Returns the new job, or None if that run was already queued.
+    """
+    after = after or _now()
+    run_at = after.astimezone(timezone.utc).replace(hour=hour_utc, minute=0, second=0, microsecond=0)
+    if run_at <= after:
+        run_at += timedelta(days=1)
+    try:
+        return await enqueue(
+            db, job_type, {**(payload or {}), "daily_hour_utc": hour_utc},
+            run_at=run_at, job_id=f"{job_type}:{run_at:%Y-%m-%d}"
+        )
+    except DuplicateKeyError:
+        return None
+
+
+async def _reschedule(db, job: Dict[str, Any]) -> None:
+    """Queue tomorrow's run of a nightly job, whatever the outcome of today's"""
+    payload = dict(job.get("payload") or {})
+    hour = payload.pop("daily_hour_utc", None)
+    if hour is None:
+        return
+    try:
+        await schedule_daily(db, job["type"], hour, payload)
+    except Exception as e:
+        # Startup scheduling on the next deploy picks it up again
+        logger.error(f"Job {job['id']}: could not schedule next daily run: {e}")
+
+
+async def get_job(db, job_id: str, user_email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Fetch job status, optionally scoped to its owner"""
+    query = {"id": job_id}
+    if user_email is not None:
+        query["user_email"] = user_email
+    return await db.jobs.find_one(query, PUBLIC_JOB_FIELDS)
+
+
+async def lease_next(db, worker_id: str, job_types: List[str]) -> Optional[Dict[str, Any]]:
+    """Atomically claim the next due job, or one whose lease has expired"""
+    now = _now()
+    return await db.jobs.find_one_and_update(
+        {
+            "type": {"$in": job_types},
+            "$or": [
+                {"status": QUEUED, "run_at": {"$lte": now}},
+                {"status": RUNNING, "lease_expires_at": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": (now + timedelta(seconds=JOB_LEASE_SECONDS)),
+                "heartbeat_at": now,
+                "started_at": now,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def heartbeat(db, job_id: str, worker_id: str) -> bool:
+    """Extend the lease. Returns False if another worker owns the job now."""
+    now = _now()
+    result = await db.jobs.update_one(
+        {"id": job_id, "lease_owner": worker_id, "status": RUNNING},
+        {"$set": {
+            "lease_expires_at": (now + timedelta(seconds=JOB_LEASE_SECONDS)),
+            "heartbeat_at": now
+        }}
+    )
+    return result.matched_count == 1
+
+
+async def update_progress(db, job_id: str, worker_id: str, progress: Dict[str, Any]) -> bool:
+    """Store progress and extend the lease"""
+    now = _now()
+    result = await db.jobs.update_one(
+        {"id": job_id, "lease_owner": worker_id, "status": RUNNING},
+        {"$set": {
+            "progress": progress,
+            "lease_expires_at": (now + timedelta(seconds=JOB_LEASE_SECONDS)),
+            "heartbeat_at": now,
+            "updated_at": now
+        }}
+    )
+    return result.matched_count == 1
+
+
+async def complete(db, job_id: str, worker_id: str, result: Any) -> None:
+    now = _now()
+    await db.jobs.update_one(
+        {"id": job_id, "lease_owner": worker_id},
+        {"$set": {
+            "status": SUCCEEDED,
+            "result": result,
+            "error": None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "finished_at": now,
+            "updated_at": now
+        }}
+    )
+
+
+async def fail(db, job: Dict[str, Any], worker_id: str, error: str) -> str:
+    """Schedule a retry with backoff, or dead-letter the job. Returns the new status."""
+    now = _now()
+    attempts = job.get("attempts", 1)
+    if attempts >= job.get("max_attempts", JOB_MAX_ATTEMPTS):
+        update = {"status": DEAD, "finished_at": now}
+    else:
+        update = {"status": QUEUED, "run_at": (now + timedelta(seconds=retry_delay(attempts)))}
+    update.update({
+        "error": error[:500],
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "updated_at": now
+    })
+    await db.jobs.update_one({"id": job["id"], "lease_owner": worker_id}, {"$set": update})
+    return update["status"]
+
+
+async def _keep_alive(db, job_id: str, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        if not await heartbeat(db, job_id, worker_id):
+            logger.warning(f"Job {job_id}: lease lost by {worker_id}")
+            return
+
+
+JobHandler = Callable[[Any, Dict[str, Any], JobContext], Awaitable[Any]]
+
+
+async def run_job(db, job: Dict[str, Any], handler: JobHandler, worker_id: str) -> None:
+    """Execute a leased job with heartbeats and record the outcome"""
+    keep_alive = asyncio.create_task(_keep_alive(db, job["id"], worker_id))
+    try:
+        result = await handler(db, job, JobContext(db, job, worker_id))
+        await complete(db, job["id"], worker_id, result)
+        logger.info(f"Job {job['id']} ({job['type']}) succeeded on attempt {job['attempts']}")
+        await _reschedule(db, job)
+    except asyncio.CancelledError:
+        # Worker shutting down - lease expiry hands the job to another worker
+        raise
+    except Exception as e:
+        new_status = await fail(db, job, worker_id, str(e))
+        logger.error(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}: {e} -> {new_status}")
+        if new_status == DEAD:
+            await _reschedule(db, job)
+    finally:
+        keep_alive.cancel()
+
+
+async def run_worker(
+    db,
+    handlers: Dict[str, JobHandler],
+    worker_id: Optional[str] = None,
+    stop_event: Optional[asyncio.Event] = None
+) -> None:
+    """Poll for jobs and run them until stop_event is set"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop_event = stop_event or asyncio.Event()
+    job_types = list(handlers.keys())
+    logger.info(f"Job worker {worker_id} started for types: {job_types}")
+
+    while not stop_event.is_set():
+        try:
+            job = await lease_next(db, worker_id, job_types)
+        except Exception as e:
+            logger.error(f"Job worker {worker_id}: lease error: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        # A job re-leased after repeated worker crashes can exceed its budget
+        if job["attempts"] > job.get("max_attempts", JOB_MAX_ATTEMPTS):
+            await fail(db, job, worker_id, job.get("error") or "Lease expired too many times")
+            await _reschedule(db, job)
+            continue
+
+        await run_job(db, job, handlers[job["type"]], worker_id)
+
+    logger.info(f"Job worker {worker_id} stopped")
+
+
+async def run_workers(db, handlers: Dict[str, JobHandler], concurrency: int, stop_event: asyncio.Event) -> None:
+    """Run several workers in this process"""
+    await asyncio.gather(*[
+        run_worker(db, handlers, stop_event=stop_event)
+        for _ in range(concurrency)
+    ])
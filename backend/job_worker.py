@@ -0,0 +1,42 @@
+"""
+Standalone job worker for Postify AI
+Runs background jobs (campaign generation, marketing batches) outside the API process.
+
+Usage:
+    JOB_WORKERS=0 uvicorn server:app ...     # API nodes
+    python job_worker.py --concurrency 4     # worker nodes
+"""
+
+import os
+import signal
+import asyncio
+import argparse
+import logging
+
+# Importing server wires up the database, LLM gateway and job handlers
+from server import db, client, JOB_HANDLERS
+import job_queue
+import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+
+async def main(concurrency: int) -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    logger.info(f"Starting {concurrency} job workers for: {list(JOB_HANDLERS.keys())}")
+    try:
+        await job_queue.run_workers(db, JOB_HANDLERS, concurrency, stop_event)
+    finally:
+        await llm_gateway.aclose()
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Postify background job workers")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get('JOB_WORKER_CONCURRENCY', '4')))
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
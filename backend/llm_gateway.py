@@ -0,0 +1,210 @@
+"""
+LLM Gateway for Postify AI
+Single async entry point for text and image generation: pooled AsyncOpenAI client,
+per-process concurrency limit and the Emergent LLM -> direct OpenAI fallback chain.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Optional, Dict, Any, AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI
+
+# Emergent integrations are optional - without them only direct OpenAI is used
+try:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+    EMERGENT_AVAILABLE = True
+except ImportError:
+    EMERGENT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TEXT_MODEL = "gpt-4o-mini"
+IMAGE_MODEL = "gpt-image-1"
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_HTTP_MAX_CONNECTIONS = int(os.environ.get('LLM_HTTP_MAX_CONNECTIONS', '32'))
+LLM_REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT', '60'))
+IMAGE_REQUEST_TIMEOUT = float(os.environ.get('IMAGE_REQUEST_TIMEOUT', '180'))
+
+# Module state, populated by configure()
+_emergent_llm_key: str = ""
+_http_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[AsyncOpenAI] = None
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no LLM provider is configured"""
+
+
+def configure(emergent_llm_key: str = "", openai_api_key: str = "") -> None:
+    """Initialize providers. Call once at startup, after environment is loaded."""
+    global _emergent_llm_key, _http_client, _openai_client
+
+    _emergent_llm_key = emergent_llm_key.strip() if EMERGENT_AVAILABLE and emergent_llm_key else ""
+
+    if openai_api_key and openai_api_key.strip() and not openai_api_key.startswith('sk-emergent'):
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=10.0)
+        )
+        _openai_client = AsyncOpenAI(api_key=openai_api_key, http_client=_http_client)
+        logger.info(f"LLM gateway: OpenAI client initialized (pool={LLM_HTTP_MAX_CONNECTIONS}, concurrency={LLM_MAX_CONCURRENCY})")
+
+    if _emergent_llm_key:
+        logger.info("LLM gateway: Emergent LLM key configured for text generation")
+
+
+def text_available() -> bool:
+    """True if at least one text provider is configured"""
+    return bool(_emergent_llm_key) or _openai_client is not None
+
+
+def images_available() -> bool:
+    """Image generation goes through direct OpenAI only"""
+    return _openai_client is not None
+
+
+async def _openai_complete(system: str, user: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+    response = await _openai_client.chat.completions.create(
+        model=TEXT_MODEL,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+    return {
+        "content": response.choices[0].message.content,
+        "tokens_used": response.usage.total_tokens,
+        "provider": "openai"
+    }
+
+
+async def _emergent_complete(system: str, user: str, session_id: str) -> Dict[str, Any]:
+    chat = LlmChat(
+        api_key=_emergent_llm_key,
+        session_id=session_id,
+        system_message=system
+    ).with_model("openai", TEXT_MODEL)
+    content = await chat.send_message(UserMessage(text=user))
+    return {
+        "content": content,
+        "tokens_used": len(content.split()) * 2,  # Emergent does not report usage
+        "provider": "emergent"
+    }
+
+
+async def complete(
+    system: str,
+    user: str,
+    max_tokens: int = 500,
+    temperature: float = 0.8,
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Generate a chat completion.
+    Tries Emergent LLM first when configured, falls back to direct OpenAI.
+    Returns {"content", "tokens_used", "provider"}.
+    """
+    if not text_available():
+        raise LLMUnavailableError("No LLM provider configured")
+
+    async with _semaphore:
+        if _emergent_llm_key:
+            try:
+                return await _emergent_complete(system, user, session_id or "postify")
+            except Exception as emergent_err:
+                if _openai_client is None:
+                    raise
+                logger.warning(f"Emergent LLM failed: {emergent_err}, falling back to direct OpenAI")
+        return await _openai_complete(system, user, max_tokens, temperature)
+
+
+async def stream_complete(
+    system: str,
+    user: str,
+    max_tokens: int = 500,
+    temperature: float = 0.8,
+    session_id: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a chat completion as it is produced.
+    Yields {"type": "delta", "content"} chunks, then one {"type": "usage", "tokens_used", "provider"}.
+    Emergent LLM does not stream, so its whole reply arrives as a single delta.
+    """
+    if not text_available():
+        raise LLMUnavailableError("No LLM provider configured")
+
+    async with _semaphore:
+        if _emergent_llm_key:
+            try:
+                result = await _emergent_complete(system, user, session_id or "postify")
+            except Exception as emergent_err:
+                if _openai_client is None:
+                    raise
+                logger.warning(f"Emergent LLM failed: {emergent_err}, falling back to direct OpenAI")
+            else:
+                yield {"type": "delta", "content": result["content"]}
+                yield {"type": "usage", "tokens_used": result["tokens_used"], "provider": result["provider"]}
+                return
+
+        stream = await _openai_client.chat.completions.create(
+            model=TEXT_MODEL,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        tokens_used = 0
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield {"type": "delta", "content": chunk.choices[0].delta.content}
+            if chunk.usage:
+                tokens_used = chunk.usage.total_tokens
+        yield {"type": "usage", "tokens_used": tokens_used, "provider": "openai"}
+
+
+async def generate_image(prompt: str, size: str) -> str:
+    """
+    Generate a single image with gpt-image-1.
+    Returns the provider URL, or a data: URL when only base64 is returned.
+    """
+    if _openai_client is None:
+        raise LLMUnavailableError("Image generation requires an OpenAI API key")
+
+    async with _semaphore:
+        response = await _openai_client.images.generate(
+            model=IMAGE_MODEL,
+            prompt=prompt,
+            n=1,
+            size=size,
+            timeout=IMAGE_REQUEST_TIMEOUT
+        )
+
+    if not response.data:
+        raise ValueError("OpenAI returned empty response")
+
+    image = response.data[0]
+    if image.url:
+        return image.url
+    if getattr(image, "b64_json", None):
+        return f"data:image/png;base64,{image.b64_json}"
+    raise ValueError("OpenAI returned no image URL")
+
+
+async def aclose() -> None:
+    """Release pooled connections on shutdown"""
+    if _http_client is not None:
+        await _http_client.aclose()
@@ -0,0 +1,68 @@
+"""
+Password Hashing for Postify AI
+bcrypt hashing and verification run in a bounded thread pool so a burst of
+logins does not block the event loop (bcrypt releases the GIL while hashing).
+
+Hashes made with a different work factor than BCRYPT_ROUNDS are flagged on
+verify, so the login handler can rehash them transparently.
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '0')) or (os.cpu_count() or 1)
+
+# min == max == default: any hash at another cost is reported as needing an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password. Returns (valid, new_hash); new_hash is set when the
+    stored hash uses an outdated work factor and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_executor(), pwd_context.verify_and_update, plain_password, hashed_password
+        )
+    except ValueError:
+        # Malformed or unknown hash format
+        logger.warning("Password verify failed: unrecognized hash")
+        return False, None
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,163 @@
+"""
+Rate Limiter for Postify AI
+GCRA (generic cell rate algorithm) limiter: each key stores a single
+"theoretical arrival time", so memory is O(1) per key and idle keys can be
+dropped as soon as that time has passed.
+
+Budgets are per plan and per endpoint scope, and a request may cost more
+than one unit (a marketing batch costs one unit per platform).
+
+Backends:
+    memory  - per-process, for a single worker (default)
+    mongo   - one atomic document per key in `rate_limits`, shared by every
+              worker and node; idle keys are removed by a TTL index
+"""
+
+import os
+import time
+import math
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()  # memory | mongo
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))  # memory backend hard cap
+
+# scope -> plan -> (units, period_seconds). A full budget may be spent in one burst.
+RATE_LIMITS: Dict[str, Dict[str, Tuple[int, int]]] = {
+    "generate": {
+        "free": (3, 60),
+        "pro": (10, 60),
+        "business": (30, 60),
+    },
+    "image": {
+        "free": (3, 60),
+        "pro": (6, 60),
+        "business": (15, 60),
+    },
+    "marketing_batch": {
+        # One unit per platform, so a full Business batch fits in the budget
+        "business": (20, 60),
+    },
+}
+
+
+def get_budget(scope: str, plan: str) -> Tuple[int, int]:
+    """(units, period_seconds) for a scope and plan; unknown plans get the free budget"""
+    budgets = RATE_LIMITS[scope]
+    return budgets.get(plan) or budgets.get("free") or min(budgets.values())
+
+
+class MemoryBackend:
+    """Per-process GCRA state: key -> theoretical arrival time (monotonic seconds)"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def _evict_idle(self, now: float) -> None:
+        # Keys are kept in last-update order; stop at the first one still in use
+        while self._tat:
+            key, tat = next(iter(self._tat.items()))
+            if tat > now and len(self._tat) <= self.max_keys:
+                break
+            del self._tat[key]
+
+    async def acquire(self, key: str, cost: int, interval: float, burst: float) -> Dict[str, Any]:
+        # No await between read and write, so this is atomic within the event loop
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + cost * interval
+        allowed = new_tat - now <= burst
+        if allowed:
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+        self._evict_idle(now)
+        return {"allowed": allowed, "retry_after": 0 if allowed else new_tat - burst - now}
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class MongoBackend:
+    """
+    Shared GCRA state in `rate_limits`: {_id: key, tat, expires_at}.
+    Each check is a single pipeline update evaluated against the server
+    clock ($$NOW), so workers never race and node clocks do not matter.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def acquire(self, key: str, cost: int, interval: float, burst: float) -> Dict[str, Any]:
+        increment_ms = cost * interval * 1000
+        burst_ms = burst * 1000
+        current = {"$max": [{"$ifNull": ["$tat", "$$NOW"]}, "$$NOW"]}
+        new_tat = {"$add": [current, increment_ms]}
+        allowed = {"$lte": [{"$subtract": [new_tat, "$$NOW"]}, burst_ms]}
+
+        doc = await self.db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "allowed": allowed,
+                    "retry_after_ms": {"$subtract": [{"$subtract": [new_tat, "$$NOW"]}, burst_ms]},
+                    "tat": {"$cond": [allowed, new_tat, current]},
+                }},
+                # Idle once tat has passed; the TTL index removes the document
+                {"$set": {"expires_at": "$tat"}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            projection={"_id": 0, "allowed": 1, "retry_after_ms": 1}
+        )
+        allowed_now = bool(doc["allowed"])
+        return {"allowed": allowed_now, "retry_after": 0 if allowed_now else doc["retry_after_ms"] / 1000}
+
+
+class RateLimiter:
+    """Plan- and scope-aware GCRA limiter over a pluggable backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def hit(self, scope: str, user_email: str, plan: str = "free", cost: int = 1) -> Dict[str, Any]:
+        """
+        Spend `cost` units of the user's budget for a scope.
+        Returns {"allowed", "retry_after" (seconds), "limit", "period"}.
+        Backend failures allow the request - rate limiting must not take the API down.
+        """
+        units, period = get_budget(scope, plan)
+        interval = period / units
+        try:
+            result = await self.backend.acquire(f"{scope}:{user_email}", cost, interval, period)
+        except Exception as e:
+            logger.error(f"Rate limiter backend error ({scope}, {user_email}): {e}")
+            result = {"allowed": True, "retry_after": 0}
+        return {**result, "limit": units, "period": period}
+
+
+limiter: Optional[RateLimiter] = None
+
+
+def configure(db) -> RateLimiter:
+    """Build the process-wide limiter from RATE_LIMIT_BACKEND"""
+    global limiter
+    if RATE_LIMIT_BACKEND == "mongo":
+        limiter = RateLimiter(MongoBackend(db))
+    else:
+        if RATE_LIMIT_BACKEND != "memory":
+            logger.warning(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', using memory")
+        limiter = RateLimiter(MemoryBackend())
+    logger.info(f"Rate limiter backend: {type(limiter.backend).__name__}")
+    return limiter
+
+
+def retry_after_header(retry_after: float) -> Dict[str, str]:
+    """Retry-After header value in whole seconds (at least 1)"""
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
@@ -0,0 +1,108 @@
+"""
+Test suite for Background Jobs
+Tests queued campaign generation and GET /api/jobs/{job_id} polling
+"""
+import time
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+# Test credentials - Pro user
+TEST_EMAIL = "sharetest@test.com"
+TEST_PASSWORD = "password"
+
+POLL_TIMEOUT_SECONDS = 120
+
+
+class TestBackgroundJobs:
+    """Tests for the job queue API"""
+
+    @pytest.fixture(scope="class")
+    def auth_token(self):
+        """Get authentication token for test user"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+        )
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        return response.json()["access_token"]
+
+    @pytest.fixture(scope="class")
+    def campaign_id(self, auth_token):
+        """Create a short campaign to generate"""
+        response = requests.post(
+            f"{BASE_URL}/api/campaigns/strategy",
+            json={
+                "business_type": "creator",
+                "primary_goal": "engagement",
+                "duration_days": 7,
+                "platforms": ["instagram"],
+                "topic": "TEST_background_jobs"
+            },
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200, f"Campaign creation failed: {response.text}"
+        return response.json()["campaign"]["id"]
+
+    def test_1_unknown_job_returns_404(self, auth_token):
+        """GET /api/jobs/{id} returns 404 for unknown job"""
+        response = requests.get(
+            f"{BASE_URL}/api/jobs/nonexistent-job-id",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 404
+
+    def test_2_job_requires_auth(self):
+        """GET /api/jobs/{id} requires authentication"""
+        response = requests.get(f"{BASE_URL}/api/jobs/nonexistent-job-id")
+        assert response.status_code in [401, 403]
+
+    def test_3_campaign_generation_is_queued(self, auth_token, campaign_id):
+        """POST /api/campaigns/generate returns 202 with a job id, job completes with posts"""
+        response = requests.post(
+            f"{BASE_URL}/api/campaigns/generate",
+            json={"campaign_id": campaign_id},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 202, f"Unexpected response: {response.text}"
+        data = response.json()
+        assert "job_id" in data
+        assert data["campaign_id"] == campaign_id
+        assert data["status"] == "queued"
+
+        # A second request while the job is active is rejected
+        response = requests.post(
+            f"{BASE_URL}/api/campaigns/generate",
+            json={"campaign_id": campaign_id},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 400
+
+        # Poll until the job finishes
+        deadline = time.time() + POLL_TIMEOUT_SECONDS
+        job = None
+        while time.time() < deadline:
+            response = requests.get(
+                f"{BASE_URL}/api/jobs/{data['job_id']}",
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+            assert response.status_code == 200
+            job = response.json()["job"]
+            if job["status"] in ["succeeded", "dead"]:
+                break
+            time.sleep(2)
+
+        assert job is not None and job["status"] == "succeeded", f"Job did not succeed: {job}"
+        assert job["result"]["campaign_id"] == campaign_id
+        assert job["result"]["posts_generated"] == len(job["result"]["posts"])
+        assert job["progress"]["done"] == job["progress"]["total"]
+
+        # Campaign is marked ready
+        response = requests.get(
+            f"{BASE_URL}/api/campaigns/{campaign_id}",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        assert response.json()["campaign"]["status"] == "ready"
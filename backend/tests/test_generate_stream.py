@@ -0,0 +1,83 @@
+"""
+Postify AI - Streaming Generation Tests
+Tests for: POST /api/generate/stream (Server-Sent Events)
+"""
+import json
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+def read_sse_events(response):
+    """Parse an SSE response body into (event, data) tuples"""
+    events = []
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line == "":
+            if data_lines:
+                events.append((event, json.loads("\n".join(data_lines))))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].strip())
+    return events
+
+
+class TestGenerateStream:
+    """Test streaming content generation"""
+
+    @pytest.fixture
+    def free_user_token(self):
+        """Get token for a fresh free user"""
+        test_email = f"test_stream_free_{int(time.time())}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Stream Test User"
+        })
+        return response.json()["access_token"]
+
+    def test_stream_requires_auth(self):
+        """Test /api/generate/stream rejects unauthenticated requests"""
+        response = requests.post(f"{BASE_URL}/api/generate/stream", json={
+            "content_type": "social_post",
+            "topic": "Test"
+        })
+        assert response.status_code in [401, 403]
+
+    def test_stream_emits_tokens_and_done_event(self, free_user_token):
+        """Test tokens are streamed and the final event matches the /api/generate body"""
+        response = requests.post(f"{BASE_URL}/api/generate/stream",
+            headers={"Authorization": f"Bearer {free_user_token}"},
+            json={
+                "content_type": "social_post",
+                "topic": "Morning coffee rituals",
+                "platform": "instagram",
+                "tone": "neutral"
+            },
+            stream=True
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = read_sse_events(response)
+        tokens = [data["content"] for event, data in events if event == "token"]
+        assert len(tokens) > 0, f"No token events: {events}"
+
+        event, done = events[-1]
+        assert event == "done", f"Stream did not finish cleanly: {events[-1]}"
+        assert done["content"] == "".join(tokens)
+        assert done["id"] == done["generation_id"]
+        assert done["watermark"] is True
+        assert "remaining_usage" in done
+
+        # Generation is persisted once the stream completes
+        history = requests.get(f"{BASE_URL}/api/history",
+            headers={"Authorization": f"Bearer {free_user_token}"}
+        )
+        assert history.status_code == 200
+        assert done["id"] in str(history.json())
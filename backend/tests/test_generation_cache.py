@@ -0,0 +1,51 @@
+"""
+Postify AI - Generation Cache Tests
+Tests for: instant mode on POST /api/generate
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+class TestGenerationCache:
+    """Test exact-match generation cache"""
+
+    @pytest.fixture
+    def free_user_token(self):
+        """Get token for a fresh free user"""
+        test_email = f"test_gencache_{int(time.time())}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Generation Cache User"
+        })
+        return response.json()["access_token"]
+
+    def test_instant_mode_reports_cache_status(self, free_user_token):
+        """Test repeated instant requests succeed and flag cached results"""
+        body = {
+            "content_type": "social_post",
+            "topic": "Weekend farmers market",
+            "platform": "instagram",
+            "tone": "neutral",
+            "instant": True
+        }
+        results = []
+        for _ in range(2):
+            response = requests.post(f"{BASE_URL}/api/generate",
+                headers={"Authorization": f"Bearer {free_user_token}"},
+                json=body
+            )
+            assert response.status_code == 200
+            results.append(response.json())
+
+        for data in results:
+            assert "cached" in data
+            if data["cached"]:
+                # Cache hits cost no tokens but are still saved and counted
+                assert data["tokens_used"] == 0
+                assert data["id"]
+        assert results[1]["remaining_usage"] == results[0]["remaining_usage"] - 1
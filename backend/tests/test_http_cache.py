@@ -0,0 +1,51 @@
+"""
+Postify AI - Catalogue Caching Tests
+Tests for: ETag / If-None-Match on /api/templates, /api/marketing-platforms, /api/campaigns/config
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+class TestCatalogueCaching:
+    """Test precomputed catalogue responses"""
+
+    @pytest.mark.parametrize("path", ["/api/templates", "/api/marketing-platforms"])
+    def test_public_catalogue_etag_and_304(self, path):
+        """Test public catalogues return a strong ETag and 304 on revalidation"""
+        response = requests.get(f"{BASE_URL}{path}")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        assert "max-age" in response.headers["Cache-Control"]
+
+        cached = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+    def test_campaign_config_is_private_per_plan(self):
+        """Test /api/campaigns/config keeps its shape and revalidates per user"""
+        test_email = f"test_config_cache_{int(time.time())}@test.com"
+        token = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Config Cache User"
+        }).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = requests.get(f"{BASE_URL}/api/campaigns/config", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["user_plan"] == "free"
+        assert data["can_create_campaigns"] is False
+        assert "business_types" in data and "plan_limits" in data
+        assert response.headers["Cache-Control"].startswith("private")
+
+        cached = requests.get(f"{BASE_URL}/api/campaigns/config",
+            headers={**headers, "If-None-Match": response.headers["ETag"]}
+        )
+        assert cached.status_code == 304
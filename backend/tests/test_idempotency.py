@@ -0,0 +1,53 @@
+"""
+Postify AI - Idempotency Tests
+Tests for: Idempotency-Key header on POST /api/generate
+"""
+import uuid
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+class TestIdempotency:
+    """Test idempotent generation requests"""
+
+    @pytest.fixture
+    def free_user_token(self):
+        """Get token for a fresh free user"""
+        test_email = f"test_idempotency_{int(time.time())}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Idempotency User"
+        })
+        return response.json()["access_token"]
+
+    def test_retry_with_same_key_replays_result(self, free_user_token):
+        """Test a retried request returns the stored result and is charged once"""
+        headers = {"Authorization": f"Bearer {free_user_token}", "Idempotency-Key": str(uuid.uuid4())}
+        body = {"content_type": "social_post", "topic": "Idempotent coffee", "tone": "neutral"}
+
+        first = requests.post(f"{BASE_URL}/api/generate", headers=headers, json=body)
+        assert first.status_code == 200
+        retry = requests.post(f"{BASE_URL}/api/generate", headers=headers, json=body)
+        assert retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+        assert retry.json()["remaining_usage"] == first.json()["remaining_usage"]
+
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers={"Authorization": f"Bearer {free_user_token}"})
+        assert me.status_code == 200
+        assert me.json()["current_usage"] == 1
+
+    def test_same_key_different_request_rejected(self, free_user_token):
+        """Test reusing a key for a different body returns 422"""
+        headers = {"Authorization": f"Bearer {free_user_token}", "Idempotency-Key": str(uuid.uuid4())}
+        first = requests.post(f"{BASE_URL}/api/generate", headers=headers,
+            json={"content_type": "social_post", "topic": "First topic", "tone": "neutral"})
+        assert first.status_code == 200
+
+        other = requests.post(f"{BASE_URL}/api/generate", headers=headers,
+            json={"content_type": "social_post", "topic": "Second topic", "tone": "neutral"})
+        assert other.status_code == 422
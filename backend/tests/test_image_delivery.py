@@ -0,0 +1,135 @@
+"""
+Postify AI - Image Delivery Tests
+Tests for: Range (206/416/invalid ranges ignored), If-None-Match (304) and
+If-Range on GET /api/images/{key} and GET /api/download-image/{id}
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+@pytest.fixture(scope="module")
+def generated_image():
+    """Register a fresh user, generate one image and return (auth headers, history item)"""
+    response = requests.post(f"{BASE_URL}/api/auth/register", json={
+        "email": f"test_delivery_{int(time.time())}@test.com",
+        "password": "TestPass123!",
+        "full_name": "Delivery User"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = requests.post(f"{BASE_URL}/api/generate-image", headers=headers,
+        json={"prompt": "A blue teapot", "style": "realistic"})
+    assert response.status_code == 200
+
+    history = requests.get(f"{BASE_URL}/api/image-history", headers=headers)
+    assert history.status_code == 200
+    return headers, history.json()["items"][0]
+
+
+class TestStoredImageRanges:
+    """Test byte ranges and validators on content-addressed images"""
+
+    @pytest.fixture
+    def stored(self, generated_image):
+        _, image = generated_image
+        if "image_key" not in image:
+            pytest.skip("Mock mode or legacy URL: image is not in the image store")
+        url = f"{BASE_URL}/api/images/{image['image_key']}"
+        full = requests.get(url)
+        assert full.status_code == 200
+        return url, full
+
+    def test_full_response_advertises_ranges(self, stored):
+        """Test the whole image is served with its length, ETag and Accept-Ranges"""
+        _, full = stored
+        assert full.headers["Accept-Ranges"] == "bytes"
+        assert int(full.headers["Content-Length"]) == len(full.content)
+        assert full.headers["ETag"]
+
+    def test_range_returns_partial_content(self, stored):
+        """Test bytes=0-99 returns exactly the first 100 bytes"""
+        url, full = stored
+        response = requests.get(url, headers={"Range": "bytes=0-99"})
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes 0-99/{len(full.content)}"
+        assert response.headers["Content-Length"] == "100"
+        assert response.content == full.content[:100]
+
+    def test_suffix_range(self, stored):
+        """Test bytes=-10 returns the last 10 bytes"""
+        url, full = stored
+        size = len(full.content)
+        response = requests.get(url, headers={"Range": "bytes=-10"})
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes {size - 10}-{size - 1}/{size}"
+        assert response.content == full.content[-10:]
+
+    def test_range_past_end_is_not_satisfiable(self, stored):
+        """Test a range starting at the image size returns 416"""
+        url, full = stored
+        size = len(full.content)
+        response = requests.get(url, headers={"Range": f"bytes={size}-"})
+        assert response.status_code == 416
+        assert response.headers["Content-Range"] == f"bytes */{size}"
+
+    def test_invalid_range_is_ignored(self, stored):
+        """Test bytes=5-2 is ignored and the whole image served"""
+        url, full = stored
+        response = requests.get(url, headers={"Range": "bytes=5-2"})
+        assert response.status_code == 200
+        assert response.content == full.content
+
+    def test_if_none_match_returns_304(self, stored):
+        """Test a matching ETag returns 304 without a body"""
+        url, full = stored
+        response = requests.get(url, headers={"If-None-Match": full.headers["ETag"]})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_if_range(self, stored):
+        """Test If-Range honours the range only while the ETag still matches"""
+        url, full = stored
+        matching = requests.get(url, headers={"Range": "bytes=0-9", "If-Range": full.headers["ETag"]})
+        assert matching.status_code == 206
+        assert matching.headers["Content-Length"] == "10"
+
+        stale = requests.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert stale.status_code == 200
+        assert stale.content == full.content
+
+
+class TestDownloadProxyRanges:
+    """Test byte ranges and validators on the authenticated download proxy"""
+
+    @pytest.fixture
+    def download(self, generated_image):
+        headers, image = generated_image
+        url = f"{BASE_URL}/api/download-image/{image['id']}"
+        full = requests.get(url, headers=headers)
+        assert full.status_code == 200
+        return url, headers, full
+
+    def test_range_returns_partial_content(self, download):
+        """Test bytes=0-99 returns exactly the first 100 bytes"""
+        url, headers, full = download
+        response = requests.get(url, headers={**headers, "Range": "bytes=0-99"})
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes 0-99/{len(full.content)}"
+        assert response.headers["Content-Length"] == "100"
+        assert response.content == full.content[:100]
+
+    def test_invalid_range_is_ignored(self, download):
+        """Test bytes=5-2 is ignored and the whole image served"""
+        url, headers, full = download
+        response = requests.get(url, headers={**headers, "Range": "bytes=5-2"})
+        assert response.status_code == 200
+        assert int(response.headers["Content-Length"]) == len(full.content)
+
+    def test_if_none_match_returns_304(self, download):
+        """Test a matching ETag returns 304"""
+        url, headers, full = download
+        response = requests.get(url, headers={**headers, "If-None-Match": full.headers["ETag"]})
+        assert response.status_code == 304
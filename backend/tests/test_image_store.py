@@ -0,0 +1,34 @@
+"""
+Postify AI - Image Store Tests
+Tests for: concurrent writes of the same content-addressed image (local backend)
+"""
+import os
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import image_store
+
+
+class TestLocalBackendWrites:
+    """Test the local backend under concurrent puts of identical bytes"""
+
+    def test_concurrent_puts_of_same_bytes(self, tmp_path):
+        """Test concurrent stores of one image all succeed and leave one whole file"""
+        image_store.backend = image_store.LocalBackend(tmp_path)
+        data = b"\x89PNG\r\n\x1a\n" + os.urandom(8 * 1024 * 1024)
+
+        async def store_concurrently():
+            return await asyncio.gather(*[image_store.put_bytes(data) for _ in range(4)])
+
+        for _ in range(5):
+            results = asyncio.run(store_concurrently())
+            key = results[0]["image_key"]
+            assert all(result["image_key"] == key for result in results)
+            path = image_store.backend._path(key)
+            assert path.read_bytes() == data
+            # No temp files left behind
+            assert sorted(p.name for p in path.parent.iterdir()) == [key]
+            path.unlink()
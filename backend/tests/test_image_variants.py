@@ -0,0 +1,54 @@
+"""
+Postify AI - Image Variant Tests
+Tests for: GET /api/images/{key}/{variant}, variant URLs in image history
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+class TestImageVariants:
+    """Test responsive WebP image variants"""
+
+    @pytest.fixture
+    def free_user_token(self):
+        """Get token for a fresh free user"""
+        test_email = f"test_variants_{int(time.time())}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Variants User"
+        })
+        return response.json()["access_token"]
+
+    def test_unknown_variant_returns_404(self):
+        """Test only the published variant names are served"""
+        response = requests.get(f"{BASE_URL}/api/images/{'0' * 64}/huge")
+        assert response.status_code == 404
+
+    def test_missing_image_variant_returns_404(self):
+        """Test a variant of a nonexistent image is not derived"""
+        response = requests.get(f"{BASE_URL}/api/images/{'0' * 64}/thumb")
+        assert response.status_code == 404
+
+    def test_stored_images_list_variant_urls(self, free_user_token):
+        """Test stored images in history carry thumb and medium WebP URLs"""
+        headers = {"Authorization": f"Bearer {free_user_token}"}
+        response = requests.post(f"{BASE_URL}/api/generate-image", headers=headers,
+            json={"prompt": "A red bicycle", "style": "realistic"})
+        assert response.status_code == 200
+
+        history = requests.get(f"{BASE_URL}/api/image-history", headers=headers)
+        assert history.status_code == 200
+        for image in history.json()["items"]:
+            if "image_key" not in image:
+                continue  # Mock mode or legacy URL: no variants
+            assert set(image["variants"]) == {"thumb", "medium"}
+            thumb_url = image["variants"]["thumb"]
+            thumb = requests.get(f"{BASE_URL}{thumb_url}" if thumb_url.startswith("/") else thumb_url)
+            assert thumb.status_code == 200
+            assert thumb.headers["Content-Type"] == "image/webp"
+            assert len(thumb.content) < image["image_bytes"]
@@ -326,6 +326,22 @@ class TestExportEndpoints:
         response = requests.get(f"{BASE_URL}/api/history/export/pdf")
         assert response.status_code in [401, 403]
 
+    def test_export_ndjson_free_user_blocked(self, free_user_token):
+        """Test NDJSON export is blocked for free users"""
+        response = requests.get(f"{BASE_URL}/api/history/export/ndjson",
+            headers={"Authorization": f"Bearer {free_user_token}"}
+        )
+
+        assert response.status_code == 403
+
+    def test_analytics_export_csv_free_user_blocked(self, free_user_token):
+        """Test streamed analytics CSV export is blocked for free users"""
+        response = requests.get(f"{BASE_URL}/api/analytics/export?format=csv",
+            headers={"Authorization": f"Bearer {free_user_token}"}
+        )
+
+        assert response.status_code == 403
+
 
 class TestGoogleOAuth:
     """Google OAuth endpoint tests"""
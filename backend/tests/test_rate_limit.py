@@ -0,0 +1,41 @@
+"""
+Postify AI - Rate Limiting Tests
+Tests for: per-plan GCRA rate limits on /api/generate and the Retry-After header
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://history-display-bug.preview.emergentagent.com')
+
+
+class TestRateLimit:
+    """Test plan-aware rate limiting"""
+
+    @pytest.fixture
+    def free_user_token(self):
+        """Get token for a fresh free user"""
+        test_email = f"test_ratelimit_{int(time.time())}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": test_email,
+            "password": "TestPass123!",
+            "full_name": "Rate Limit Test User"
+        })
+        return response.json()["access_token"]
+
+    def test_free_burst_then_429_with_retry_after(self, free_user_token):
+        """Test a free user gets 3 generations per minute, then 429 with Retry-After"""
+        statuses = []
+        for i in range(4):
+            response = requests.post(f"{BASE_URL}/api/generate",
+                headers={"Authorization": f"Bearer {free_user_token}"},
+                json={"content_type": "social_post", "topic": f"Rate limit test {i}", "tone": "neutral"}
+            )
+            statuses.append(response.status_code)
+
+        # Rate limit is checked before the monthly quota
+        assert statuses[-1] == 429, f"Statuses: {statuses}"
+        retry_after = int(response.headers["Retry-After"])
+        assert 1 <= retry_after <= 60
+        assert "per minute" in response.json()["detail"]
@@ -0,0 +1,211 @@
+"""
+Timestamps for Postify AI
+All timestamps are stored as native BSON datetimes (UTC). This module parses
+legacy ISO-string values and migrates existing documents in resumable batches.
+
+Usage:
+    python timestamps.py migrate [--batch-size 500] [--restart]
+    python timestamps.py status
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MIGRATION_ID = "iso_strings_to_datetimes"
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '500'))
+MIGRATION_PAUSE_SECONDS = float(os.environ.get('MIGRATION_PAUSE_SECONDS', '0.05'))  # Throttle between batches
+
+# collection -> timestamp fields. Dotted paths reach into arrays of subdocuments.
+TIMESTAMP_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at", "onboarding_completed_at", "trial_activated_at", "email_unsubscribed_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "subscriptions": ["updated_at"],
+    "user_preferences": ["updated_at"],
+    "brand_profiles": ["updated_at"],
+    "drafts": ["updated_at"],
+    "generations": ["created_at"],
+    "image_generations": ["created_at"],
+    "image_batches": ["created_at"],
+    "image_analytics": ["timestamp"],
+    "user_templates": ["created_at"],
+    "favorites": ["created_at", "favorited_at", "updated_at"],
+    "favorite_folders": ["created_at", "updated_at"],
+    "campaigns": ["created_at", "updated_at", "posts.generated_at", "posts.regenerated_at"],
+    "scheduled_posts": ["scheduled_time", "created_at", "updated_at", "published_at"],
+    "share_events": ["created_at", "timestamp"],
+    "analytics_events": ["created_at"],
+    "referrals": ["created_at"],
+    "pricing_events": ["timestamp"],
+    "email_logs": ["sent_at"],
+    "drip_sequences": ["created_at", "next_email_at", "last_email_sent", "completed_at", "cancelled_at"],
+    "drip_queue": ["check_at", "created_at", "processed_at"],
+    "jobs": ["run_at", "lease_expires_at", "heartbeat_at", "started_at", "created_at", "updated_at", "finished_at"],
+}
+
+
+def to_datetime(value: Any) -> datetime:
+    """
+    Coerce a stored or user-supplied timestamp to an aware UTC datetime.
+    Accepts datetimes (naive ones are assumed UTC) and ISO 8601 strings.
+    Raises ValueError for anything else.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str):
+        dt = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    else:
+        raise ValueError(f"Not a timestamp: {value!r}")
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def parse_optional(value: Any) -> Optional[datetime]:
+    """to_datetime that maps missing or unparseable values to None"""
+    try:
+        return to_datetime(value) if value else None
+    except ValueError:
+        return None
+
+
+def _convert(value: Any, path: List[str]) -> Any:
+    """Return value with string timestamps at path converted; arrays are walked element-wise"""
+    if isinstance(value, list):
+        return [_convert(item, path) for item in value]
+    if not path:
+        if isinstance(value, str):
+            return parse_optional(value) or value  # Unparseable strings are left as-is
+        return value
+    if isinstance(value, dict) and path[0] in value:
+        return {**value, path[0]: _convert(value[path[0]], path[1:])}
+    return value
+
+
+def convert_document(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Compute the $set needed to convert a document. Keys are top-level fields."""
+    updates = {}
+    for field in fields:
+        top, *rest = field.split(".")
+        if top not in doc:
+            continue
+        current = updates.get(top, doc[top])
+        converted = _convert(current, rest)
+        if converted != doc[top]:
+            updates[top] = converted
+    return updates
+
+
+async def _checkpoint(db, collection: str) -> Dict[str, Any]:
+    return await db.migrations.find_one({"_id": f"{MIGRATION_ID}:{collection}"}) or {}
+
+
+async def migrate_collection(db, collection: str, batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Convert string timestamps in one collection, batch by batch in _id order.
+    Progress is checkpointed so an interrupted run resumes where it stopped.
+    Each update is conditional on the original values, so concurrent app writes win.
+    """
+    fields = TIMESTAMP_FIELDS[collection]
+    checkpoint = await _checkpoint(db, collection)
+    if checkpoint.get("done"):
+        return {"collection": collection, "converted": 0, "skipped": True}
+
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field.split(".")[0]: 1 for field in fields}
+    last_id = checkpoint.get("last_id")
+    converted = checkpoint.get("converted", 0)
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = await db[collection].find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            updates = convert_document(doc, fields)
+            if updates:
+                original = {key: doc[key] for key in updates}
+                ops.append(UpdateOne({"_id": doc["_id"], **original}, {"$set": updates}))
+        if ops:
+            result = await db[collection].bulk_write(ops, ordered=False)
+            converted += result.modified_count
+
+        last_id = docs[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": f"{MIGRATION_ID}:{collection}"},
+            {"$set": {"last_id": last_id, "converted": converted, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        await asyncio.sleep(MIGRATION_PAUSE_SECONDS)
+
+    await db.migrations.update_one(
+        {"_id": f"{MIGRATION_ID}:{collection}"},
+        {"$set": {"done": True, "converted": converted, "finished_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"Timestamp migration: {collection} done, {converted} documents converted")
+    return {"collection": collection, "converted": converted, "skipped": False}
+
+
+async def migrate(db, batch_size: int = MIGRATION_BATCH_SIZE, restart: bool = False) -> List[Dict[str, Any]]:
+    """Run the migration over every registered collection"""
+    if restart:
+        await db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_ID}:"}})
+    return [await migrate_collection(db, collection, batch_size) for collection in TIMESTAMP_FIELDS]
+
+
+async def remaining(db) -> Dict[str, int]:
+    """Count documents that still hold string timestamps"""
+    counts = {}
+    for collection, fields in TIMESTAMP_FIELDS.items():
+        counts[collection] = await db[collection].count_documents(
+            {"$or": [{field: {"$type": "string"}} for field in fields]}
+        )
+    return counts
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if args.command == "migrate":
+            for row in await migrate(db, args.batch_size, args.restart):
+                status = "skipped (done)" if row["skipped"] else f"{row['converted']} converted"
+                print(f"{row['collection']:<18} {status}")
+
+        counts = await remaining(db)
+        for collection, count in counts.items():
+            if count:
+                print(f"{collection:<18} {count} documents still have string timestamps")
+        print(f"{sum(counts.values())} documents with string timestamps remaining")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migrate ISO-string timestamps to BSON datetimes")
+    parser.add_argument("command", choices=["migrate", "status"])
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints and rescan every collection")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
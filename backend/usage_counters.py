@@ -0,0 +1,200 @@
+"""
+Usage Counters for Postify AI
+Materialized per-user, per-month usage: one document per (user_email, month),
+updated with atomic $inc on every generation and read with a point lookup.
+Counters mirror the raw collections and can be rebuilt from them at any time.
+
+Usage:
+    python usage_counters.py reconcile [--month 2025-01]
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple
+
+from pymongo import UpdateOne, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Counter fields
+TEXT = "text"                      # documents in generations (campaign posts included)
+IMAGES = "images"                  # documents in image_generations
+CAMPAIGN_POSTS = "campaign_posts"  # generations with content_type=campaign_post
+BONUS_CREDITS = "bonus_credits"    # bonus credits granted this month (not rebuildable)
+COUNTER_FIELDS = [TEXT, IMAGES, CAMPAIGN_POSTS, BONUS_CREDITS]
+
+
+def month_key(when: Optional[datetime] = None) -> str:
+    """Calendar month in UTC, e.g. '2025-01'"""
+    return (when or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    """[start, end) datetimes of a month key"""
+    start = datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+async def record_usage(db, user_email: str, when: Optional[datetime] = None, **increments: int) -> None:
+    """Atomically add to this month's counters, e.g. record_usage(db, email, text=1)"""
+    increments = {field: n for field, n in increments.items() if n}
+    if not increments:
+        return
+    now = datetime.now(timezone.utc)
+    await db.usage_counters.update_one(
+        {"user_email": user_email, "month": month_key(when)},
+        {
+            "$inc": increments,
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+
+
+async def reserve_usage(db, user_email: str, field: str, amount: int, limit: int) -> int:
+    """
+    Atomically take up to `amount` units of a counter without passing `limit`.
+    Returns how many were granted (0..amount). Unused units are given back
+    with record_usage(db, email, when=..., **{field: -unused}).
+    """
+    if amount <= 0:
+        return 0
+    await get_usage(db, user_email)  # Seed this month's document from raw history
+    current = {"$ifNull": [f"${field}", 0]}
+    before = await db.usage_counters.find_one_and_update(
+        {"user_email": user_email, "month": month_key()},
+        [{"$set": {
+            field: {"$max": [current, {"$min": [{"$add": [current, amount]}, limit]}]},
+            "updated_at": "$$NOW"
+        }}],
+        projection={"_id": 0, field: 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    used = (before or {}).get(field, 0)
+    return max(0, min(amount, limit - used))
+
+
+async def count_raw_usage(db, user_email: str, month: str) -> Dict[str, int]:
+    """Count usage for one user and month straight from the raw collections"""
+    start, end = month_range(month)
+    window = {"user_email": user_email, "created_at": {"$gte": start, "$lt": end}}
+    text, images, campaign_posts = await asyncio.gather(
+        db.generations.count_documents(window),
+        db.image_generations.count_documents(window),
+        db.generations.count_documents({**window, "content_type": "campaign_post"})
+    )
+    return {TEXT: text, IMAGES: images, CAMPAIGN_POSTS: campaign_posts}
+
+
+async def get_usage(db, user_email: str, month: Optional[str] = None) -> Dict[str, int]:
+    """
+    Read a user's counters for a month (default: current).
+    A missing document is seeded once from the raw collections, so history
+    written before counters existed is still counted.
+    """
+    month = month or month_key()
+    doc = await db.usage_counters.find_one({"user_email": user_email, "month": month}, {"_id": 0})
+    if doc is None:
+        seed = await count_raw_usage(db, user_email, month)
+        now = datetime.now(timezone.utc)
+        await db.usage_counters.update_one(
+            {"user_email": user_email, "month": month},
+            {"$setOnInsert": {**seed, BONUS_CREDITS: 0, "created_at": now, "updated_at": now}},
+            upsert=True
+        )
+        doc = await db.usage_counters.find_one({"user_email": user_email, "month": month}, {"_id": 0}) or seed
+    return {field: doc.get(field, 0) for field in COUNTER_FIELDS}
+
+
+async def _group_counts(collection, match: Dict[str, Any]) -> Dict[str, int]:
+    rows = await collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$user_email", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    return {row["_id"]: row["count"] for row in rows if row["_id"]}
+
+
+async def reconcile_month(db, month: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rebuild text/image/campaign counters for every user active in a month.
+    Uses one grouped aggregation per collection; bonus_credits are left as-is.
+    """
+    month = month or month_key()
+    start, end = month_range(month)
+    window = {"created_at": {"$gte": start, "$lt": end}}
+
+    text, images, campaign_posts = await asyncio.gather(
+        _group_counts(db.generations, window),
+        _group_counts(db.image_generations, window),
+        _group_counts(db.generations, {**window, "content_type": "campaign_post"})
+    )
+
+    now = datetime.now(timezone.utc)
+    emails = set(text) | set(images)
+    ops = [
+        UpdateOne(
+            {"user_email": email, "month": month},
+            {
+                "$set": {
+                    TEXT: text.get(email, 0),
+                    IMAGES: images.get(email, 0),
+                    CAMPAIGN_POSTS: campaign_posts.get(email, 0),
+                    "reconciled_at": now,
+                    "updated_at": now
+                },
+                "$setOnInsert": {BONUS_CREDITS: 0, "created_at": now}
+            },
+            upsert=True
+        )
+        for email in emails
+    ]
+    if ops:
+        await db.usage_counters.bulk_write(ops, ordered=False)
+
+    # Users with a counter but no usage left in the raw collections
+    stale = await db.usage_counters.update_many(
+        {"month": month, "user_email": {"$nin": list(emails)}},
+        {"$set": {TEXT: 0, IMAGES: 0, CAMPAIGN_POSTS: 0, "reconciled_at": now, "updated_at": now}}
+    )
+
+    logger.info(f"Usage counters reconciled for {month}: {len(emails)} users, {stale.modified_count} reset")
+    return {"month": month, "users": len(emails), "reset": stale.modified_count}
+
+
+async def run_reconcile_job(db, job: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """Job handler: reconcile counters for payload["month"] (default: current month)"""
+    return await reconcile_month(db, job["payload"].get("month"))
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        result = await reconcile_month(db, args.month)
+        print(f"{result['month']}: {result['users']} users reconciled, {result['reset']} counters reset")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild usage counters from raw collections")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.add_argument("--month", default=None, help="YYYY-MM, defaults to the current month")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
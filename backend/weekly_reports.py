@@ -0,0 +1,260 @@
+"""
+Weekly AI Marketing Reports for Postify AI
+The weekly report covers the last seven complete UTC days, so it only changes
+once a day. A nightly job walks Pro/Business users in chunks, builds each
+report from the daily rollups and stores it in `weekly_reports`, one document
+per (user_email, ISO week) holding that week's latest report. The endpoint
+serves the stored document and only builds on demand when there is none for
+today yet (new subscribers, or requests before the nightly run finishes).
+
+Usage:
+    python weekly_reports.py refresh [--user EMAIL] [--restart]
+    python weekly_reports.py status
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, List
+
+from pymongo import UpdateOne
+
+import daily_rollups
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WEEKLY_REPORTS_BATCH_SIZE = int(os.environ.get('WEEKLY_REPORTS_BATCH_SIZE', '100'))
+WEEKLY_REPORTS_CONCURRENCY = int(os.environ.get('WEEKLY_REPORTS_CONCURRENCY', '8'))
+WEEKLY_REPORTS_RETENTION_DAYS = int(os.environ.get('WEEKLY_REPORTS_RETENTION_DAYS', '56'))
+
+# Plans with weekly reports (see ANALYTICS_ACCESS in server.py; the nightly job passes the live list)
+DEFAULT_PLANS = ["pro", "business"]
+
+MIGRATION_ID = "weekly_reports"
+SUGGESTED_PLATFORMS = ["instagram", "tiktok", "telegram"]
+
+
+def iso_week(when: Optional[datetime] = None) -> str:
+    """ISO week of `when` (default: now) in UTC, e.g. 2026-W42"""
+    year, week, _ = (when or datetime.now(timezone.utc)).astimezone(timezone.utc).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+async def build_report(db, user_email: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """The seven complete UTC days before today, compared with the seven before that"""
+    end = daily_rollups.day_start(now)
+    week_ago = end - timedelta(days=7)
+    two_weeks_ago = week_ago - timedelta(days=7)
+
+    this_week, last_week, recent = await asyncio.gather(
+        daily_rollups.breakdowns(db, user_email, week_ago, end),
+        daily_rollups.breakdowns(db, user_email, two_weeks_ago, week_ago),
+        db.generations.find(
+            {"user_email": user_email, "created_at": {"$gte": week_ago, "$lt": end}},
+            {"_id": 0, "generated_content": 1, "content_type": 1, "platform": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(5).to_list(5)
+    )
+
+    # Calculate metrics
+    this_week_count = this_week["total"]
+    last_week_count = last_week["total"]
+    change_percent = round(((this_week_count - last_week_count) / max(last_week_count, 1)) * 100) if last_week_count > 0 else 0
+
+    # Latest content of the week
+    top_content = []
+    for gen in recent:
+        content = gen.get("generated_content", "")[:100]
+        top_content.append({
+            "preview": content,
+            "type": gen.get("content_type"),
+            "platform": gen.get("platform"),
+            "created_at": gen.get("created_at")
+        })
+
+    # Missed opportunities
+    missed = []
+    platforms_this_week = set(this_week["platform"])
+    for platform in SUGGESTED_PLATFORMS:
+        if platform not in platforms_this_week:
+            missed.append({
+                "type": "unused_platform",
+                "platform": platform,
+                "message": f"No content for {platform} this week",
+                "message_ru": f"Нет контента для {platform} на этой неделе"
+            })
+
+    # Next steps
+    next_steps = []
+    if this_week_count < 7:
+        next_steps.append({
+            "action": "increase_frequency",
+            "message": "Aim for at least 1 post per day",
+            "message_ru": "Старайтесь публиковать минимум 1 пост в день"
+        })
+
+    if len(platforms_this_week) < 2:
+        next_steps.append({
+            "action": "diversify",
+            "message": "Try posting on multiple platforms",
+            "message_ru": "Попробуйте публиковать на разных платформах"
+        })
+
+    return {
+        "locked": False,
+        "period": {
+            "start": week_ago.isoformat(),
+            "end": end.isoformat()
+        },
+        "summary": {
+            "total_content": this_week_count,
+            "vs_last_week": change_percent,
+            "trend": "up" if change_percent > 0 else "down" if change_percent < 0 else "stable"
+        },
+        "top_content": top_content,
+        "missed_opportunities": missed,
+        "next_steps": next_steps,
+        "cta": {
+            "message": "Based on your results, we recommend 3 Instagram Reels this week.",
+            "message_ru": "На основе ваших результатов, рекомендуем 3 Instagram Reels на этой неделе.",
+            "action": "create_campaign"
+        }
+    }
+
+
+def _store(user_email: str, report: Dict[str, Any], now: datetime) -> UpdateOne:
+    return UpdateOne(
+        {"user_email": user_email, "week": iso_week(now)},
+        {"$set": {
+            "report": report,
+            "day": daily_rollups.day_start(now),
+            "generated_at": now,
+            "expires_at": now + timedelta(days=WEEKLY_REPORTS_RETENTION_DAYS)
+        }},
+        upsert=True
+    )
+
+
+async def get_or_build(db, user_email: str) -> Dict[str, Any]:
+    """Today's stored report, or build and store it now"""
+    now = datetime.now(timezone.utc)
+    doc = await db.weekly_reports.find_one(
+        {"user_email": user_email, "week": iso_week(now), "day": daily_rollups.day_start(now)},
+        {"_id": 0, "report": 1}
+    )
+    if doc:
+        return doc["report"]
+
+    report = await build_report(db, user_email, now)
+    await db.weekly_reports.bulk_write([_store(user_email, report, now)])
+    return report
+
+
+async def _build_chunk(db, emails: List[str], now: datetime, semaphore: asyncio.Semaphore) -> List[UpdateOne]:
+    async def build(email):
+        async with semaphore:
+            try:
+                return _store(email, await build_report(db, email, now), now)
+            except Exception as e:
+                # One bad user must not stall the run; the endpoint builds theirs on demand
+                logger.warning(f"Weekly report failed for {email}: {e}")
+                return None
+
+    ops = await asyncio.gather(*[build(email) for email in emails])
+    return [op for op in ops if op is not None]
+
+
+async def refresh_all(db, plans: Optional[List[str]] = None, restart: bool = False, ctx=None) -> Dict[str, Any]:
+    """
+    Build and store today's report for every user on `plans`, walking users in
+    _id order with a per-day checkpoint in `migrations`, so a retried run
+    resumes where the last one stopped.
+    """
+    plans = plans or DEFAULT_PLANS
+    now = datetime.now(timezone.utc)
+    checkpoint_id = f"{MIGRATION_ID}:{daily_rollups.day_start(now):%Y-%m-%d}"
+    if restart:
+        await db.migrations.delete_one({"_id": checkpoint_id})
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("finished_at"):
+        return {"users": checkpoint.get("users", 0), "failed": checkpoint.get("failed", 0)}
+    last_id = checkpoint.get("last_id")
+    users = checkpoint.get("users", 0)
+    failed = checkpoint.get("failed", 0)
+
+    semaphore = asyncio.Semaphore(max(1, WEEKLY_REPORTS_CONCURRENCY))
+    total = await db.users.count_documents({"subscription_plan": {"$in": plans}})
+
+    while True:
+        query: Dict[str, Any] = {"subscription_plan": {"$in": plans}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.users.find(query, {"email": 1}).sort("_id", 1).limit(WEEKLY_REPORTS_BATCH_SIZE).to_list(WEEKLY_REPORTS_BATCH_SIZE)
+        if not batch:
+            break
+
+        emails = [user["email"] for user in batch if user.get("email")]
+        ops = await _build_chunk(db, emails, now, semaphore)
+        if ops:
+            await db.weekly_reports.bulk_write(ops, ordered=False)
+        users += len(ops)
+        failed += len(emails) - len(ops)
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "users": users, "failed": failed, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        if ctx is not None:
+            await ctx.progress(users + failed, total)
+
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"users": users, "failed": failed, "finished_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"Weekly reports refreshed: {users} users, {failed} failed")
+    return {"users": users, "failed": failed}
+
+
+async def run_weekly_reports_job(db, job: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """Job handler: refresh today's reports for payload["plans"] (default: Pro and Business)"""
+    return await refresh_all(db, job["payload"].get("plans"), job["payload"].get("restart", False), ctx)
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if args.command == "refresh":
+            if args.user:
+                now = datetime.now(timezone.utc)
+                report = await build_report(db, args.user, now)
+                await db.weekly_reports.bulk_write([_store(args.user, report, now)])
+                print(f"{args.user}: {report['summary']['total_content']} pieces of content this week")
+            else:
+                result = await refresh_all(db, restart=args.restart)
+                print(f"{result['users']} reports stored, {result['failed']} failed")
+        week = iso_week()
+        print(f"{await db.weekly_reports.count_documents({'week': week})} reports stored for {week}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute weekly AI marketing reports for Pro and Business users")
+    parser.add_argument("command", choices=["refresh", "status"])
+    parser.add_argument("--user", default=None, help="Only build this user's report")
+    parser.add_argument("--restart", action="store_true", help="Ignore today's checkpoint and rebuild every report")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Button } from './ui/button';
 import { toast } from 'sonner';
+import { resolveImageUrl } from '../lib/images';
 import { 
   Copy, RefreshCw, Edit3, Download, Star, Share2, 
   Check, Loader2, Image, Wand2, Target, Pencil, Sparkles
@@ -104,7 +105,7 @@ export const QuickActions = ({
         link.click();
         document.body.removeChild(link);
       } else {
-        const response = await fetch(imageUrl);
+        const response = await fetch(resolveImageUrl(imageUrl));
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
         const link = document.createElement('a');
@@ -1,5 +1,6 @@
 import { useCallback } from 'react';
 import { toast } from 'sonner';
+import { resolveImageUrl } from '../lib/images';
 import { useLanguage } from '../contexts/LanguageContext';
 
 export const useShare = () => {
@@ -37,11 +38,12 @@ export const useShare = () => {
   }, [language]);
 
   const shareImage = useCallback(async (imageUrl, title = 'Postify AI Image') => {
+    const url = resolveImageUrl(imageUrl);
     // For images, try to share the URL or download
     if (navigator.share) {
       try {
         // Try to fetch and share as file (mobile)
-        const response = await fetch(imageUrl);
+        const response = await fetch(url);
         const blob = await response.blob();
         const file = new File([blob], 'postify-image.png', { type: 'image/png' });
         
@@ -60,7 +62,7 @@ export const useShare = () => {
 
     // Fallback - copy URL
     try {
-      await navigator.clipboard.writeText(imageUrl);
+      await navigator.clipboard.writeText(url);
       toast.success(language === 'ru' ? 'Ссылка скопирована!' : 'Link copied!');
       return true;
     } catch (error) {
@@ -0,0 +1,61 @@
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+
+// POST /api/generate/stream and read its Server-Sent Events.
+// Calls onToken(text) for each chunk and resolves with the final `done` payload.
+// Errors reject with an axios-shaped error (error.response.status / .data.detail)
+// so callers can share handling with the non-streaming endpoint.
+export async function streamGeneration(requestData, token, onToken) {
+  const response = await fetch(`${API_URL}/api/generate/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Authorization: `Bearer ${token}`
+    },
+    body: JSON.stringify(requestData)
+  });
+
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    throw httpError(response.status, data.detail);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = parseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      if (!message) continue;
+
+      if (message.event === 'token') onToken(message.data.content);
+      else if (message.event === 'done') return message.data;
+      else if (message.event === 'error') throw httpError(message.data.status, message.data.detail);
+    }
+  }
+
+  throw httpError(500, 'Stream ended unexpectedly');
+}
+
+function parseEvent(raw) {
+  let event = 'message';
+  const dataLines = [];
+  raw.split('\n').forEach((line) => {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+  });
+  if (dataLines.length === 0) return null;
+  return { event, data: JSON.parse(dataLines.join('\n')) };
+}
+
+function httpError(status, detail) {
+  const error = new Error(detail || 'Generation failed');
+  error.response = { status, data: { detail } };
+  return error;
+}
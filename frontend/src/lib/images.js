@@ -0,0 +1,16 @@
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+
+// Stored images come back as backend-relative paths (/api/images/<key>) unless
+// the backend sets IMAGE_PUBLIC_BASE_URL. Resolve them against the backend so
+// they work in <img>, fetch(), window.open() and copied share links.
+// Absolute, data: and blob: URLs pass through unchanged.
+export function resolveImageUrl(url) {
+  if (!url || !url.startsWith('/')) return url;
+  return `${API_URL}${url}`;
+}
+
+// srcSet for stored images that carry thumb/medium WebP variants
+export function variantSrcSet(variants) {
+  if (!variants) return undefined;
+  return `${resolveImageUrl(variants.thumb)} 256w, ${resolveImageUrl(variants.medium)} 768w`;
+}
@@ -0,0 +1,24 @@
+import axios from 'axios';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+
+// Poll a background job until it finishes and resolve with its result.
+// Failures reject with an axios-shaped error so callers can keep reading
+// error.response.data.detail.
+export async function waitForJob(jobId, token, { onProgress, intervalMs = 1500 } = {}) {
+  for (;;) {
+    const res = await axios.get(`${API_URL}/api/jobs/${jobId}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    const job = res.data.job;
+    if (onProgress) onProgress(job);
+
+    if (job.status === 'succeeded') return job.result;
+    if (job.status === 'dead') {
+      const error = new Error(job.error || 'Job failed');
+      error.response = { data: { detail: job.error || 'Job failed' } };
+      throw error;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
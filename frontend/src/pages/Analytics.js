@@ -308,13 +308,14 @@ export const Analytics = () => {
   const handleExport = async (format) => {
     try {
       const res = await axios.get(`${API_URL}/api/analytics/export?format=${format}&period=${period}`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        responseType: format === 'csv' ? 'blob' : 'json'
       });
       if (format === 'csv') {
-        const blob = new Blob([res.data.csv], { type: 'text/csv' });
-        const url = URL.createObjectURL(blob);
+        const url = URL.createObjectURL(res.data);
         const a = document.createElement('a');
-        a.href = url; a.download = res.data.filename; a.click();
+        a.href = url; a.download = `postify_analytics_${period}.csv`; a.click();
+        URL.revokeObjectURL(url);
       } else {
         const blob = new Blob([JSON.stringify(res.data.data, null, 2)], { type: 'application/json' });
         const url = URL.createObjectURL(blob);
@@ -25,6 +25,7 @@ import { useAnalytics } from '../hooks/useAnalytics';
 import { useShare } from '../hooks/useShare';
 import { useAutosave, AutosaveIndicator } from '../hooks/useAutosave';
 import { ShareFirstPostModal } from '../components/ShareFirstPostModal';
+import { streamGeneration } from '../lib/generationStream';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 const FIRST_SHARE_SHOWN_KEY = 'postify_first_share_shown';
@@ -301,6 +302,8 @@ export const ContentGenerator = () => {
   ];
 
   const handleGenerate = async (regenerate = false, modifier = null) => {
+    if (result?.streaming) return;
+
     // Validation
     if (activeTab === 'social_post' && !formData.topic.trim()) {
       toast.error(language === 'ru' ? 'Введите тему поста' : 'Please enter a topic');
@@ -351,28 +354,29 @@ export const ContentGenerator = () => {
       };
     }
 
+    const meta = {
+      type: activeTab,
+      platform: formData.platform,
+      tone: formData.tone,
+      goal: activeTab === 'social_post' ? formData.post_goal : formData.video_goal
+    };
+
     try {
-      const response = await axios.post(
-        `${API_URL}/api/generate`,
-        requestData,
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
-
-      setResult({
-        ...response.data,
-        meta: {
-          type: activeTab,
-          platform: formData.platform,
-          tone: formData.tone,
-          goal: activeTab === 'social_post' ? formData.post_goal : formData.video_goal
-        }
+      // Stream tokens into the result as they arrive
+      let streamed = '';
+      const data = await streamGeneration(requestData, token, (chunk) => {
+        streamed += chunk;
+        setLoading(false);
+        setResult({ content: streamed, streaming: true, meta });
       });
+
+      setResult({ ...data, meta });
       
       // Track successful generation
       trackGeneration(activeTab, true, { 
         tone: formData.tone,
         platform: formData.platform,
-        tokens: response.data.tokens_used 
+        tokens: data.tokens_used 
       });
       
       // Clear draft after successful generation
@@ -13,6 +13,7 @@ import { EmptyState } from '../components/EmptyState';
 import { useAnalytics } from '../hooks/useAnalytics';
 import { useShare } from '../hooks/useShare';
 import { toast } from 'sonner';
+import { resolveImageUrl, variantSrcSet } from '../lib/images';
 import { useNavigate } from 'react-router-dom';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
@@ -366,7 +367,7 @@ export const History = () => {
       const image = imageHistory.find(i => i.id === imageId);
       if (image?.image_url) {
         try {
-          const r = await fetch(image.image_url);
+          const r = await fetch(resolveImageUrl(image.image_url));
           const blob = await r.blob();
           const blobUrl = window.URL.createObjectURL(blob);
           const link = document.createElement('a');
@@ -375,7 +376,7 @@ export const History = () => {
           setTimeout(() => { document.body.removeChild(link); window.URL.revokeObjectURL(blobUrl); }, 300);
           toast.success(language === 'ru' ? 'Скачано!' : 'Downloaded!');
         } catch {
-          window.open(image.image_url, '_blank');
+          window.open(resolveImageUrl(image.image_url), '_blank');
           toast.info(language === 'ru' ? 'Открыто в новой вкладке' : 'Opened in new tab');
         }
       } else {
@@ -532,7 +533,7 @@ export const History = () => {
               {imageHistory.map(image => (
                 <div key={image.id} className="bg-[#111113] border border-white/[0.06] rounded-xl overflow-hidden group" data-testid="image-history-item">
                   <div className="relative aspect-square">
-                    <img src={image.image_url} alt={image.prompt} className="w-full h-full object-cover" />
+                    <img src={resolveImageUrl(image.variants?.thumb || image.image_url)} srcSet={variantSrcSet(image.variants)} sizes="(min-width: 768px) 33vw, 50vw" alt={image.prompt} loading="lazy" className="w-full h-full object-cover" />
                     {image.aspect_ratio && (
                       <div className="absolute top-2 left-2 flex items-center gap-1 px-1.5 py-0.5 bg-black/60 backdrop-blur-sm rounded-md text-[10px] text-white/80">
                         <Ratio className="w-2.5 h-2.5" />{image.aspect_ratio}
@@ -19,6 +19,8 @@ import { useLanguage } from '../contexts/LanguageContext';
 import { GenerationProgress } from '../components/GenerationProgress';
 import { useAnalytics } from '../hooks/useAnalytics';
 import { useShare } from '../hooks/useShare';
+import { waitForJob } from '../lib/jobs';
+import { resolveImageUrl } from '../lib/images';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -204,10 +206,15 @@ export const ImageGenerator = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      setBatchResults(response.data.images);
+      // Batch runs as a background job; show images as they complete
+      const result = await waitForJob(response.data.job_id, token, {
+        onProgress: (job) => setBatchResults(job.progress?.partial || [])
+      });
+
+      setBatchResults(result.images);
       toast.success(language === 'ru' 
-        ? `Создано ${response.data.total_generated} изображений!` 
-        : `Generated ${response.data.total_generated} images!`);
+        ? `Создано ${result.total_generated} изображений!` 
+        : `Generated ${result.total_generated} images!`);
       
       fetchHistory();
     } catch (error) {
@@ -279,7 +286,7 @@ export const ImageGenerator = () => {
           console.error('Proxy download failed:', proxyError);
           // Fallback: try direct fetch from image URL
           try {
-            const response = await fetch(imageUrl);
+            const response = await fetch(resolveImageUrl(imageUrl));
             const blob = await response.blob();
             const blobUrl = window.URL.createObjectURL(blob);
             
@@ -298,7 +305,7 @@ export const ImageGenerator = () => {
           } catch (fetchError) {
             console.error('Direct fetch failed:', fetchError);
             // Final fallback: open in new tab
-            window.open(imageUrl, '_blank');
+            window.open(resolveImageUrl(imageUrl), '_blank');
             toast.info(language === 'ru' ? 'Открыто в новой вкладке - сохраните правой кнопкой мыши' : 'Opened in new tab - right-click to save');
           }
         }
@@ -600,7 +607,7 @@ export const ImageGenerator = () => {
                   <div className="space-y-4">
                     <div className="relative rounded-xl overflow-hidden bg-[#0A0A0B] border border-white/10 group">
                       <img 
-                        src={generatedImage.image_url} 
+                        src={resolveImageUrl(generatedImage.image_url)} 
                         alt={generatedImage.prompt}
                         className="w-full h-auto"
                         data-testid="generated-image"
@@ -777,7 +784,7 @@ export const ImageGenerator = () => {
                         {result.image_url ? (
                           <>
                             <img 
-                              src={result.image_url} 
+                              src={resolveImageUrl(result.image_url)} 
                               alt={result.platform}
                               className="w-full rounded-lg border border-white/10"
                             />
@@ -841,8 +848,9 @@ export const ImageGenerator = () => {
                   className="group relative rounded-lg overflow-hidden bg-[#0A0A0B] border border-white/10 hover:border-purple-500/50 transition-colors"
                 >
                   <img 
-                    src={item.image_url} 
+                    src={resolveImageUrl(item.variants?.thumb || item.image_url)} 
                     alt={item.prompt}
+                    loading="lazy"
                     className="w-full aspect-square object-cover"
                   />
                   <div className="absolute inset-0 bg-black/60 opacity-0 group-hover:opacity-100 transition-opacity flex items-center justify-center">
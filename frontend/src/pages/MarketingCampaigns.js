@@ -7,6 +7,7 @@ import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
+import { Switch } from '../components/ui/switch';
 import { Progress } from '../components/ui/progress';
 import { Badge } from '../components/ui/badge';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
@@ -21,6 +22,8 @@ import {
 } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
 import { useLanguage } from '../contexts/LanguageContext';
+import { waitForJob } from '../lib/jobs';
+import { resolveImageUrl } from '../lib/images';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -55,6 +58,7 @@ export const MarketingCampaigns = () => {
   const [loading, setLoading] = useState(true);
   const [creating, setCreating] = useState(false);
   const [generating, setGenerating] = useState(false);
+  const [includeImages, setIncludeImages] = useState(false);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [selectedCampaign, setSelectedCampaign] = useState(null);
   const [expandedPosts, setExpandedPosts] = useState({});
@@ -222,20 +226,23 @@ export const MarketingCampaigns = () => {
     try {
       const res = await axios.post(
         `${API_URL}/api/campaigns/generate`,
-        { campaign_id: campaignId },
+        { campaign_id: campaignId, generate_images: includeImages },
         { headers: { Authorization: `Bearer ${token}` } }
       );
       
+      // Generation runs as a background job
+      const result = await waitForJob(res.data.job_id, token);
+      
       // Update campaign in list
       setCampaigns(campaigns.map(c => 
-        c.id === campaignId ? { ...c, posts: res.data.posts, status: 'ready', quality_score: res.data.quality_score } : c
+        c.id === campaignId ? { ...c, posts: result.posts, images: result.images, status: 'ready', quality_score: result.quality_score } : c
       ));
       
       if (selectedCampaign?.id === campaignId) {
-        setSelectedCampaign({ ...selectedCampaign, posts: res.data.posts, status: 'ready', quality_score: res.data.quality_score });
+        setSelectedCampaign({ ...selectedCampaign, posts: result.posts, images: result.images, status: 'ready', quality_score: result.quality_score });
       }
       
-      toast.success(`${res.data.posts_generated} ${language === 'ru' ? 'постов сгенерировано!' : 'posts generated!'}`);
+      toast.success(`${result.posts_generated} ${language === 'ru' ? 'постов сгенерировано!' : 'posts generated!'}`);
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to generate content');
     } finally {
@@ -612,6 +619,20 @@ export const MarketingCampaigns = () => {
 
               {/* Generate CTA — full width, no card */}
               <div className="pt-2">
+                {selectedCampaign.total_images > 0 && (
+                  <div className="flex items-center justify-between mb-3">
+                    <span className="text-sm text-gray-400">
+                      {language === 'ru'
+                        ? `Сгенерировать ${selectedCampaign.total_images} изображений (из месячного лимита)`
+                        : `Generate ${selectedCampaign.total_images} images (uses your monthly image quota)`}
+                    </span>
+                    <Switch
+                      checked={includeImages}
+                      onCheckedChange={setIncludeImages}
+                      data-testid="campaign-images-toggle"
+                    />
+                  </div>
+                )}
                 <Button 
                   className="w-full bg-[#FF3B30] hover:bg-[#FF4D42] h-14 text-base font-semibold shadow-lg shadow-[#FF3B30]/20"
                   onClick={() => generateCampaignContent(selectedCampaign.id)}
@@ -733,6 +754,9 @@ export const MarketingCampaigns = () => {
                             animate={{ opacity: 1, height: 'auto' }}
                             exit={{ opacity: 0, height: 0 }}
                           >
+                            {post.image_url && (
+                              <img src={resolveImageUrl(post.image_url)} alt="" loading="lazy" className="mt-3 w-full max-w-sm rounded-lg border border-white/[0.06]" />
+                            )}
                             <div className="text-sm text-gray-300 whitespace-pre-line mt-3 leading-relaxed">
                               {post.content}
                             </div>